@@ -0,0 +1,293 @@
+"""
+Benchmarks for StockDatasetUpdater against a local ScreenerStub serving synthetic universes.
+
+For each universe size the stub's rows are split over nyse/nasdaq/amex and a fresh dataset is
+built in a temp directory, then these operations run in order, each in its own spawned process
+so peak RSS belongs to that operation alone:
+
+  update_json:cold         empty dataset, no screener cache
+  update_json:cached       nothing changed, snapshots within cache_ttl (no network)
+  update_json:revalidate   cache_ttl=0: conditional requests answered 304
+  update_json:drift        cache_ttl=0 and every price moved
+  upsert_ticker            one ticker, from the snapshot cache
+  set_target_price         one manual edit
+  apply_edits:1000         1000 target/rating/strategy/industry edits in one batch
+
+Each result has wall time, peak RSS, bytes written (wchar from /proc/self/io, so it includes
+every write the operation made: JSON, published/shard/sector/search files, snapshots), bytes
+served by the stub, and the updater's per-phase breakdown (UpdaterMetrics). Results are saved as JSON; `--compare old.json` prints the time ratios.
+
+`--normalize 10000,100000` (the default) also times screener-row normalization in-process at
+those sizes: the per-row `_normalize_row` loop against the batched `_normalize_rows`, best of
+REPEAT runs, after checking both give the same records. `--search 7000,100000` (the default)
+likewise times SearchIndex.search against a linear substring scan over SEARCH_QUERIES, after
+checking both return the same rows (top 20 and all matches), and reports the size and load time
+of the index file.
+
+    python bench.py --sizes 7000,50000,500000 --latency 0.05 --out bench_results.json
+    python bench.py --sizes 50000 --disable shards,history --compare bench_results.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from screener_stub import ScreenerStub, synthetic_rows
+
+EXCHANGES = ("nyse", "nasdaq", "amex")
+OPERATIONS = ("update_json:cold", "update_json:cached", "update_json:revalidate", "update_json:drift",
+              "upsert_ticker", "set_target_price", "apply_edits:1000")
+EDIT_COUNT = 1000
+FEATURES = ("publish", "shards", "sectors", "search_index", "history", "load_cache")  # --disable choices
+REPEAT = 3  # in-process timings keep the best of this many runs
+SEARCH_QUERIES = ("a", "ap", "zz", "q", "ab", "bank", "hol", "holdings inc", "semi", "oil & gas",
+                  "xyz", "b ", "estate invest", "nope-nothing")
+SEARCH_LIMIT = 20
+
+
+def _io_written() -> Optional[int]:
+    try:
+        with open("/proc/self/io", "r") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _run_operation(op: str, json_path: str, updater_kwargs: Dict, tickers: List[str]) -> Dict:
+    """Child process: run one operation and measure it."""
+    import logging
+    from update_stocks import StockDatasetUpdater
+
+    updater = StockDatasetUpdater(json_path, logger=logging.getLogger("bench"), **updater_kwargs)
+    updater.logger.setLevel(logging.WARNING)
+    if op == "apply_edits:1000":
+        fields = StockDatasetUpdater.EDIT_FIELDS
+        values = {"target_price": "123.45", "strategy": "long", "rating": "4",
+                  "last_updated": "2025-01-02", "industry": "Banks"}
+        edits = [{"ticker": tickers[i % len(tickers)], "field": fields[i % len(fields)],
+                  "value": values[fields[i % len(fields)]]} for i in range(EDIT_COUNT)]
+    baseline_rss = _rss_bytes()
+    written = _io_written()
+    start = time.perf_counter()
+
+    if op.startswith("update_json"):
+        updater.update_json()
+    elif op == "upsert_ticker":
+        updater.upsert_ticker(tickers[len(tickers) // 2])
+    elif op == "set_target_price":
+        updater.set_target_price(tickers[0], "321.00")
+    elif op == "apply_edits:1000":
+        updater.apply_edits(edits)
+    else:
+        raise ValueError(f"Unknown operation {op!r}")
+
+    wall = time.perf_counter() - start
+    after = _io_written()
+    return {
+        "wall_s": round(wall, 4),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "baseline_rss_mb": round(baseline_rss / 2 ** 20, 1) if baseline_rss is not None else None,
+        "bytes_written": after - written if after is not None and written is not None else None,
+        "phases": updater.metrics.last["phases"] if updater.metrics.last else {},
+    }
+
+
+def run_size(rows: int, latency: float, updater_kwargs: Dict, ops=OPERATIONS, keep: bool = False) -> List[Dict]:
+    universe = synthetic_rows(rows)
+    split = {exch: universe[i::len(EXCHANGES)] for i, exch in enumerate(EXCHANGES)}
+    tickers = [r["symbol"] for r in universe[:EDIT_COUNT]]
+    workdir = Path(tempfile.mkdtemp(prefix=f"bench-{rows}-"))
+    json_path = workdir / "data" / "stocks.json"
+    json_path.parent.mkdir(parents=True)
+    json_path.write_text("[]", encoding="utf-8")
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    try:
+        with ScreenerStub(split, latency=latency) as stub, ctx.Pool(1, maxtasksperchild=1) as pool:
+            for op in ops:
+                if op == "update_json:drift":
+                    drifted = synthetic_rows(rows, drift=0.05)
+                    for i, exch in enumerate(EXCHANGES):
+                        stub.set_rows(exch, drifted[i::len(EXCHANGES)])
+                kwargs = dict(updater_kwargs, api_url=stub.url)
+                if op in ("update_json:revalidate", "update_json:drift"):
+                    kwargs["cache_ttl"] = 0
+                served = sum(stub.bytes_sent.values())
+                result = pool.apply(_run_operation, (op, str(json_path), kwargs, tickers))
+                result.update(rows=rows, op=op, latency_s=latency,
+                              bytes_downloaded=sum(stub.bytes_sent.values()) - served,
+                              dataset_bytes=json_path.stat().st_size)
+                results.append(result)
+                print(f"{rows:>8} {op:<24} {result['wall_s']:>9.3f}s {result['peak_rss_mb']:>9.1f}MB "
+                      f"{(result['bytes_written'] or 0) / 2 ** 20:>9.1f}MB written "
+                      f"{result['bytes_downloaded'] / 2 ** 20:>8.1f}MB downloaded", flush=True)
+    finally:
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def _best_of(fn) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_normalize(rows: int) -> Dict:
+    """Per-row `_normalize_row` loop vs batched `_normalize_rows` over `rows` synthetic screener rows."""
+    import logging
+    from update_stocks import StockDatasetUpdater
+
+    updater = StockDatasetUpdater(os.devnull, logger=logging.getLogger("bench"))
+    universe = synthetic_rows(rows)
+
+    def per_row() -> Dict[str, Dict]:
+        out = {}
+        for row in universe:
+            rec = updater._normalize_row(row)
+            if rec is not None:
+                out[rec["ticker"]] = rec
+        return out
+
+    if per_row() != updater._normalize_rows(universe):
+        raise AssertionError(f"_normalize_rows disagrees with _normalize_row at {rows} rows")
+    row_s = _best_of(per_row)
+    batch_s = _best_of(lambda: updater._normalize_rows(universe))
+    result = {"rows": rows, "per_row_s": round(row_s, 4), "batched_s": round(batch_s, 4),
+              "speedup": round(row_s / batch_s, 2)}
+    print(f"{rows:>8} normalize  per-row {row_s * 1000:>8.1f}ms  batched {batch_s * 1000:>8.1f}ms  "
+          f"{result['speedup']:>5.2f}x", flush=True)
+    return result
+
+
+def bench_search(rows: int) -> Dict:
+    """
+    SearchIndex.search vs a linear `q in text` scan (same ranking) over `rows` synthetic records.
+    The index is round-tripped through its JSON file format, whose size and load time are reported too.
+    """
+    import logging
+    from search_index import SearchIndex
+    from update_stocks import StockDatasetUpdater, StockTable
+
+    updater = StockDatasetUpdater(os.devnull, logger=logging.getLogger("bench"))
+    table = StockTable.from_records(updater._normalize_rows(synthetic_rows(rows)).values())
+    data = json.dumps(SearchIndex.build(table).to_json(), ensure_ascii=False, separators=(",", ":"))
+    load_s = _best_of(lambda: SearchIndex.from_json(json.loads(data), table))
+    index = SearchIndex.from_json(json.loads(data), table)
+    tickers, texts = index.tickers, index.texts
+    queries = SEARCH_QUERIES + tuple(tickers[i].lower() for i in range(0, len(tickers), max(1, len(tickers) // 6)))
+
+    def linear(query: str, limit: int) -> List[int]:
+        q = query.strip().lower()
+        qu = q.upper()
+        hits = [i for i, text in enumerate(texts) if q in text]
+        exact = [i for i in hits if tickers[i] == qu]
+        prefix = [i for i in hits if tickers[i].startswith(qu) and tickers[i] != qu]
+        rest = [i for i in hits if not tickers[i].startswith(qu)]
+        return (exact + prefix + rest)[:limit]
+
+    for q in queries:
+        for limit in (SEARCH_LIMIT, len(texts)):
+            if index.search(q, limit) != linear(q, limit):
+                raise AssertionError(f"SearchIndex disagrees with a linear scan for {q!r} (limit {limit})")
+    index_s = _best_of(lambda: [index.search(q, SEARCH_LIMIT) for q in queries])
+    scan_s = _best_of(lambda: [linear(q, SEARCH_LIMIT) for q in queries])
+    result = {"rows": rows, "queries": len(queries), "index_ms_per_query": round(index_s / len(queries) * 1000, 3),
+              "scan_ms_per_query": round(scan_s / len(queries) * 1000, 3), "speedup": round(scan_s / index_s, 1),
+              "file_bytes": len(data.encode("utf-8")), "load_ms": round(load_s * 1000, 1)}
+    print(f"{rows:>8} search     index {result['index_ms_per_query']:>8.3f}ms/q  "
+          f"scan {result['scan_ms_per_query']:>8.3f}ms/q  {result['speedup']:>6.1f}x  "
+          f"file {result['file_bytes'] / 1e6:.2f}MB loads in {result['load_ms']:.1f}ms", flush=True)
+    return result
+
+
+def compare(current: List[Dict], previous_path: str) -> None:
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = {(r["rows"], r["op"]): r for r in json.load(f)["results"]}
+    print(f"\nvs {previous_path} (time ratio new/old; >1 is slower)")
+    for r in current:
+        old = previous.get((r["rows"], r["op"]))
+        if old and old["wall_s"]:
+            print(f"{r['rows']:>8} {r['op']:<24} {r['wall_s'] / old['wall_s']:>6.2f}x time "
+                  f"{r['peak_rss_mb'] / old['peak_rss_mb']:>6.2f}x rss")
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark StockDatasetUpdater against a local screener stub.")
+    parser.add_argument("--sizes", default="7000,50000,500000", help="comma-separated universe sizes")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the stub waits before each response")
+    parser.add_argument("--ops", default=",".join(OPERATIONS), help="comma-separated subset of: " + ", ".join(OPERATIONS))
+    parser.add_argument("--disable", default="", help="updater features to turn off: " + ", ".join(FEATURES))
+    parser.add_argument("--normalize", default="10000,100000",
+                        help="sizes for the normalization micro-benchmark ('' to skip)")
+    parser.add_argument("--search", default="7000,100000",
+                        help="sizes for the search-index vs linear-scan micro-benchmark ('' to skip)")
+    parser.add_argument("--out", default="bench_results.json", help="where to save the results")
+    parser.add_argument("--compare", default=None, help="previous results file to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the temp dataset directories")
+    args = parser.parse_args()
+
+    ops = [op for op in args.ops.split(",") if op]
+    unknown = set(ops) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"unknown operation(s): {', '.join(sorted(unknown))}")
+    updater_kwargs = {name: False for name in args.disable.split(",") if name}
+    unknown = set(updater_kwargs) - set(FEATURES)
+    if unknown:
+        parser.error(f"unknown feature(s): {', '.join(sorted(unknown))}")
+    results = []
+    for size in (int(s) for s in args.sizes.split(",") if s):
+        results += run_size(size, args.latency, updater_kwargs, ops, args.keep)
+    normalize = [bench_normalize(int(s)) for s in args.normalize.split(",") if s]
+    search = [bench_search(int(s)) for s in args.search.split(",") if s]
+
+    doc = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "disabled": sorted(updater_kwargs),
+        "results": results,
+        "normalize": normalize,
+        "search": search,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2)
+    print(f"Saved {len(results)} results to {args.out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
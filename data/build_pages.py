@@ -0,0 +1,246 @@
+"""
+Static page generator: renders stocks/<T>/<T>.html for every record and sectors/<slug>.html for
+every industry (slug rule = slugifyIndustry in script.js) from templates/stock.html and
+templates/sector.html (string.Template, `$name` placeholders).
+
+Incremental: each page's inputs (template + the values it shows) are hashed and kept in
+`<stem>.pages.json` next to the dataset. Only pages whose hash changed, or whose file is missing,
+are rendered, by a process pool, each written to a temp file and renamed over the old page.
+Generated pages that no longer have a record are removed.
+
+Pages without the generator <meta> tag (the hand-written AAPL/JPM/STZ and financials pages)
+are never overwritten.
+
+    python build_pages.py [--json path/to/stocks.json] [--workers N] [--force]
+"""
+import argparse
+import hashlib
+import html
+import json
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from string import Template
+from typing import Dict, List, Optional, Tuple
+
+from update_stocks import DEFAULT_JSON, StockDatasetUpdater, StockTable
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+GENERATOR_MARK = b'<meta name="generator" content="build_pages.py"'
+CHUNK = 256  # pages per worker task
+
+Job = Tuple[str, str, Dict[str, str]]  # (page path relative to site root, template name, context)
+
+
+def _fmt_price(raw: str) -> str:
+    v = StockTable.parse_money(raw)
+    return "—" if math.isnan(v) else f"${v:,.2f}"
+
+
+def _fmt_cap(v: float) -> str:
+    if math.isnan(v):
+        return "—"
+    for div, unit in ((1e12, "T"), (1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if v >= div:
+            return f"${v / div:,.2f}{unit}"
+    return f"${v:,.0f}"
+
+
+def _render_chunk(site_root: str, templates: Dict[str, str], jobs: List[Job]) -> int:
+    """Worker: render and atomically write one chunk of pages."""
+    compiled = {name: Template(text) for name, text in templates.items()}
+    root = Path(site_root)
+    for rel, template, context in jobs:
+        page = compiled[template].substitute(context).encode("utf-8")
+        StockDatasetUpdater._write_atomic(root / rel, page)
+    return len(jobs)
+
+
+class PageBuilder:
+    def __init__(
+        self,
+        json_path: str,
+        site_root: Optional[str] = None,
+        templates_dir: Optional[str] = None,
+        workers: Optional[int] = None,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.json_path = Path(json_path)
+        self.site_root = Path(site_root) if site_root else self.json_path.parent.parent
+        self.templates_dir = Path(templates_dir) if templates_dir else TEMPLATES_DIR
+        self.workers = workers or os.cpu_count() or 1
+        self.manifest_path = self.json_path.with_name(self.json_path.stem + ".pages.json")
+        self.logger = logger or logging.getLogger("PageBuilder")
+
+    # ---------------- Public API ----------------
+
+    def build(self, table: Optional[StockTable] = None, force: bool = False) -> Dict:
+        """
+        Bring the generated pages in line with the dataset. Returns
+        {"rendered", "unchanged", "kept", "removed"} page counts; `kept` are hand-written pages
+        left alone. `force=True` re-renders every generated page.
+        """
+        if table is None:
+            with self.json_path.open("r", encoding="utf-8") as f:
+                table = StockTable.from_records(json.load(f))
+        templates = {name: (self.templates_dir / f"{name}.html").read_text(encoding="utf-8")
+                     for name in ("stock", "sector")}
+        template_sha = {name: hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+                        for name, text in templates.items()}
+        previous = self._read_manifest()
+
+        pages: Dict[str, str] = {}
+        todo: List[Job] = []
+        kept = unchanged = 0
+        for rel, template, context in self._jobs(table):
+            digest = hashlib.sha256(json.dumps([template_sha[template], context], sort_keys=True,
+                                               ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+            path = self.site_root / rel
+            if not force and previous.get(rel) == digest and path.is_file():
+                pages[rel] = digest
+                unchanged += 1
+                continue
+            if not self._is_generated(path):
+                kept += 1
+                continue
+            pages[rel] = digest
+            todo.append((rel, template, context))
+
+        rendered = self._render(templates, todo)
+
+        removed = 0
+        for rel in previous:
+            if rel not in pages:
+                path = self.site_root / rel
+                if self._is_generated(path):
+                    path.unlink(missing_ok=True)
+                    self._prune_dirs(path.parent)
+                    removed += 1
+
+        StockDatasetUpdater._write_atomic(self.manifest_path, json.dumps(
+            {"generated_at": datetime.now().isoformat(timespec="seconds"), "pages": pages},
+            ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        self.logger.info("Pages: %d rendered, %d unchanged, %d hand-written kept, %d removed",
+                         rendered, unchanged, kept, removed)
+        return {"rendered": rendered, "unchanged": unchanged, "kept": kept, "removed": removed}
+
+    # ---------------- Rendering ----------------
+
+    def _jobs(self, table: StockTable) -> List[Job]:
+        """One (path, template, context) per ticker page and per industry page, values HTML-escaped."""
+        e = html.escape
+        slug_of = StockDatasetUpdater.slugify_industry
+        jobs: List[Job] = []
+        groups: Dict[str, List[int]] = {}
+        names: Dict[str, set] = {}
+        for row in table.sorted_rows():
+            rec = table.record(row)
+            industry = rec["industry"]
+            slug = slug_of(industry)
+            groups.setdefault(slug, []).append(row)
+            names.setdefault(slug, set()).add(industry or "Unclassified")
+            current = StockTable.parse_money(rec["current_price"])
+            target = StockTable.parse_money(rec["target_price"])
+            upside = target / current - 1 if current and not math.isnan(current) and not math.isnan(target) else math.nan
+            jobs.append((rec["page"], "stock", {
+                "root": self._root_prefix(rec["page"]),
+                "name": e(rec["name"] or rec["ticker"]),
+                "ticker": e(rec["ticker"]),
+                "industry": e(industry or "Unclassified"),
+                "sector_page": e(f"sectors/{slug}.html"),
+                "current_price": _fmt_price(rec["current_price"]),
+                "target_price": _fmt_price(rec["target_price"]),
+                "upside": "—" if math.isnan(upside) else f"{upside:+.1%}",
+                "market_cap": e(rec["market_cap"] or "—"),
+                "rating": e(rec["rating"] or "—"),
+                "strategy": e(rec["strategy"] or "—"),
+                "last_updated": e(rec["last_updated"] or "—"),
+            }))
+
+        for slug, rows in groups.items():
+            rel = f"sectors/{slug}.html"
+            root = self._root_prefix(rel)
+            caps = table.market_cap_value
+            rows = sorted(rows, key=lambda r: math.inf if math.isnan(caps[r]) else -caps[r])  # largest first
+            total = math.fsum(caps[r] for r in rows if not math.isnan(caps[r]))
+            lines = []
+            for r in rows:
+                rec = table.record(r)
+                lines.append(
+                    f'              <tr><td><a href="{e(root + rec["page"])}">{e(rec["ticker"])}</a></td>'
+                    f'<td>{e(rec["name"])}</td><td class="num">{e(rec["market_cap"] or "—")}</td>'
+                    f'<td class="num">{_fmt_price(rec["current_price"])}</td>'
+                    f'<td class="num">{_fmt_price(rec["target_price"])}</td>'
+                    f'<td>{e(rec["rating"] or "—")}</td><td>{e(rec["last_updated"] or "—")}</td></tr>')
+            jobs.append((rel, "sector", {
+                "root": root,
+                "industry": e(" / ".join(sorted(names[slug]))),
+                "count": str(len(rows)),
+                "market_cap": _fmt_cap(total) if total else "—",
+                "rows": "\n".join(lines),
+            }))
+        return jobs
+
+    def _render(self, templates: Dict[str, str], jobs: List[Job]) -> int:
+        if not jobs:
+            return 0
+        chunks = [jobs[i:i + CHUNK] for i in range(0, len(jobs), CHUNK)]
+        if self.workers <= 1 or len(chunks) == 1:
+            return sum(_render_chunk(str(self.site_root), templates, c) for c in chunks)
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(chunks))) as pool:
+            futures = [pool.submit(_render_chunk, str(self.site_root), templates, c) for c in chunks]
+            return sum(f.result() for f in futures)
+
+    # ---------------- Helpers ----------------
+
+    @staticmethod
+    def _root_prefix(rel: str) -> str:
+        """'../' per directory level, so pages link to the site root at any depth (tickers may contain '/')."""
+        return "../" * (len(Path(rel).parts) - 1)
+
+    @staticmethod
+    def _is_generated(path: Path) -> bool:
+        """True when the page is missing or carries the generator tag (i.e. is ours to overwrite)."""
+        try:
+            with path.open("rb") as f:
+                return GENERATOR_MARK in f.read(1024)
+        except FileNotFoundError:
+            return True
+
+    def _prune_dirs(self, d: Path) -> None:
+        """Remove directories emptied by page removals, up to (not including) the site root."""
+        root = self.site_root.resolve()
+        d = d.resolve()
+        while d != root and root in d.parents:
+            try:
+                d.rmdir()
+            except OSError:
+                break
+            d = d.parent
+
+    def _read_manifest(self) -> Dict[str, str]:
+        try:
+            with self.manifest_path.open("r", encoding="utf-8") as f:
+                return json.load(f).get("pages") or {}
+        except (OSError, ValueError):
+            return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate ticker and sector pages from the dataset.")
+    parser.add_argument("--json", default=DEFAULT_JSON, help="dataset path (default: stocks.json next to this script)")
+    parser.add_argument("--site-root", default=None, help="default: the dataset's parent's parent")
+    parser.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="re-render every generated page")
+    args = parser.parse_args()
+    if not Path(args.json).is_file():
+        parser.error(f"no dataset at {args.json}")
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    PageBuilder(args.json, args.site_root, workers=args.workers).build(force=args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Columnar daily price history written by StockDatasetUpdater.update_json().
+
+    history = PriceHistory("data/history")
+    history.series("AAPL", start="2025-01-01")
+"""
+import json
+import math
+import mmap
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from update_stocks import StockTable
+
+
+class PriceHistory:
+    """
+    Append-only daily price / market-cap history, one block of rows per recorded date.
+
+    Files under `root`:
+      date.i32, slot.i32, price.f64, cap.f64  - fixed-width columns, one row per ticker per date
+                                                (rows in a block sorted by slot; NaN = missing)
+      days.json                                - [[yyyymmdd, start_row, row_count], ...] ascending
+      tickers.json                             - {ticker: slot}
+    Reads go through mmap'd memoryviews and touch only the rows they need:
+    a ticker's series bisects its slot in each date block; a date reads one block.
+    """
+
+    COLUMNS = (("date", "i"), ("slot", "i"), ("price", "d"), ("cap", "d"))
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.days: List[List[int]] = self._read_json("days.json", [])
+        self.slots: Dict[str, int] = self._read_json("tickers.json", {})
+        self._tickers_by_slot: Optional[List[str]] = None
+
+    # ---- write ----
+
+    def append(self, date: str, table: "StockTable", fresh: Optional[Iterable[str]] = None) -> int:
+        """
+        Record `table`'s current_price / market_cap for `date` (YYYY-MM-DD) and return the row count.
+        Only tickers in `fresh` (default: all) get their prices; the rest are recorded as NaN, so
+        rows carried over from an earlier refresh never pass for today's prices.
+        Re-recording the latest date replaces its block; dates must otherwise be increasing.
+        days.json is written last, so every column is first cut back to the rows it lists: an
+        append interrupted part-way leaves nothing behind.
+        """
+        day = int(date.replace("-", ""))
+        if self.days and day < self.days[-1][0]:
+            raise ValueError(f"history already has {self.days[-1][0]}; cannot append earlier date {day}")
+        if self.days and day == self.days[-1][0]:
+            self.days.pop()
+        self._truncate(self._row_count())
+
+        for tkr in table.tickers:
+            if tkr not in self.slots:
+                self.slots[tkr] = len(self.slots)
+        self._tickers_by_slot = None
+        rows = sorted((self.slots[tkr], row) for row, tkr in enumerate(table.tickers))
+        start = self._row_count()
+        if fresh is None:
+            price, cap = table.price, table.market_cap_value
+        else:
+            fresh = set(fresh)
+            price = [p if t in fresh else math.nan for t, p in zip(table.tickers, table.price)]
+            cap = [c if t in fresh else math.nan for t, c in zip(table.tickers, table.market_cap_value)]
+        cols = {
+            "date": array("i", [day]) * len(rows),
+            "slot": array("i", (slot for slot, _ in rows)),
+            "price": array("d", (price[row] for _, row in rows)),
+            "cap": array("d", (cap[row] for _, row in rows)),
+        }
+        self.root.mkdir(parents=True, exist_ok=True)
+        for name, _ in self.COLUMNS:
+            with (self.root / f"{name}.{self._suffix(name)}").open("ab") as f:
+                cols[name].tofile(f)
+        self.days.append([day, start, len(rows)])
+        self._write_json("tickers.json", self.slots)
+        self._write_json("days.json", self.days)
+        return len(rows)
+
+    # ---- read ----
+
+    def dates(self) -> List[str]:
+        return [self._fmt_day(d) for d, _, _ in self.days]
+
+    def series(self, ticker: str, start: Optional[str] = None,
+               end: Optional[str] = None) -> List[Tuple[str, float, float]]:
+        """[(date, price, market_cap), ...] for one ticker, oldest first, optionally within [start, end]."""
+        slot = self.slots.get(ticker.upper())
+        if slot is None:
+            return []
+        lo = int(start.replace("-", "")) if start else 0
+        hi = int(end.replace("-", "")) if end else 99999999
+        out = []
+        with self._columns("slot", "price", "cap") as (slots, prices, caps):
+            for day, first, count in self.days:
+                if day < lo or day > hi:
+                    continue
+                i = self._find_slot(slots, first, first + count, slot)
+                if i is not None:
+                    out.append((self._fmt_day(day), prices[i], caps[i]))
+        return out
+
+    def prices_on(self, date: str) -> Dict[str, float]:
+        """Ticker -> price recorded on `date` (empty if that date was not recorded)."""
+        day = int(date.replace("-", ""))
+        i = bisect_left([d for d, _, _ in self.days], day)
+        if i == len(self.days) or self.days[i][0] != day:
+            return {}
+        _, first, count = self.days[i]
+        names = self._ticker_names()
+        with self._columns("slot", "price") as (slots, prices):
+            return {names[slots[j]]: prices[j] for j in range(first, first + count)}
+
+    def return_since(self, ticker: str, since: str) -> Optional[float]:
+        """
+        Fractional price change from the first recorded date on/after `since` to the latest one
+        (e.g. 0.12 = +12%). None when there is no usable price at either end.
+        """
+        points = [(d, p) for d, p, _ in self.series(ticker, start=since) if not math.isnan(p)]
+        if len(points) < 1 or points[0][1] <= 0:
+            return None
+        return points[-1][1] / points[0][1] - 1
+
+    # ---- internals ----
+
+    @staticmethod
+    def _find_slot(slots, lo: int, hi: int, slot: int) -> Optional[int]:
+        i = bisect_left(slots, slot, lo, hi)
+        return i if i < hi and slots[i] == slot else None
+
+    @contextmanager
+    def _columns(self, *names: str):
+        """mmap the named column files read-only and yield typed memoryviews over them."""
+        files, maps, views = [], [], []
+        try:
+            for name in names:
+                path = self.root / f"{name}.{self._suffix(name)}"
+                if not path.exists() or path.stat().st_size == 0:
+                    views.append(memoryview(b"").cast(self._typecode(name)))
+                    continue
+                f = path.open("rb")
+                files.append(f)
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                maps.append(m)
+                views.append(memoryview(m).cast(self._typecode(name)))
+            yield views
+        finally:
+            for v in views:
+                v.release()
+            for m in maps:
+                m.close()
+            for f in files:
+                f.close()
+
+    def _ticker_names(self) -> List[str]:
+        if self._tickers_by_slot is None:
+            names = [""] * len(self.slots)
+            for tkr, slot in self.slots.items():
+                names[slot] = tkr
+            self._tickers_by_slot = names
+        return self._tickers_by_slot
+
+    def _row_count(self) -> int:
+        return self.days[-1][1] + self.days[-1][2] if self.days else 0
+
+    def _truncate(self, rows: int) -> None:
+        for name, code in self.COLUMNS:
+            path = self.root / f"{name}.{self._suffix(name)}"
+            if path.exists():
+                with path.open("r+b") as f:
+                    f.truncate(rows * array(code).itemsize)
+
+    @classmethod
+    def _typecode(cls, name: str) -> str:
+        return dict(cls.COLUMNS)[name]
+
+    @classmethod
+    def _suffix(cls, name: str) -> str:
+        return "i32" if cls._typecode(name) == "i" else "f64"
+
+    @staticmethod
+    def _fmt_day(day: int) -> str:
+        return f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}"
+
+    def _read_json(self, name: str, default):
+        try:
+            with (self.root / name).open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def _write_json(self, name: str, obj) -> None:
+        path = self.root / name
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(json.dumps(obj, separators=(",", ":")).encode("utf-8"))
+        tmp.replace(path)
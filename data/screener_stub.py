@@ -0,0 +1,136 @@
+"""
+Local stand-in for the Nasdaq screener endpoint, for exercising StockDatasetUpdater offline.
+
+Serves `GET <url>?download=true&exchange=<exch>` with a `{"data": {"rows": [...]}}` payload in
+the screener's row format, honours If-None-Match (304), optionally waits `latency` seconds before
+answering, and counts requests and body bytes served per exchange. `synthetic_rows()` builds
+deterministic universes of any size.
+
+    with ScreenerStub({"nasdaq": [{"symbol": "AAPL", "name": "Apple Inc.", ...}]}) as stub:
+        updater = StockDatasetUpdater("stocks.json", api_url=stub.url, include_nyse=False, include_amex=False)
+        updater.update_json()
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+API_PATH = "/api/screener/stocks"
+INDUSTRIES = [
+    "Banks", "Biotechnology: Pharmaceutical Preparations", "Computer Manufacturing",
+    "EDP Services", "Oil & Gas Production", "Real Estate Investment Trusts", "Semiconductors",
+    "Beverages (Production/Distribution)", "Major Pharmaceuticals", "Telecommunications Equipment",
+    "Property-Casualty Insurers", "Industrial Machinery/Components", "Retail: Building Materials",
+    "Electric Utilities: Central", "Aerospace", "Hotels/Resorts", "Trucking Freight/Courier Services",
+]
+
+
+def synthetic_rows(n: int, seed: int = 0, drift: float = 0.0) -> List[Dict]:
+    """
+    `n` screener rows with unique symbols (A, B, ..., AA, AB, ...). The same seed gives the same
+    universe; `drift` moves every price by up to that fraction, as a later refresh would.
+    """
+    rng = random.Random(seed)
+    move = random.Random(seed + 1)
+    rows = []
+    for i in range(n):
+        symbol, k = "", i + 1
+        while k:
+            k, r = divmod(k - 1, 26)
+            symbol = chr(65 + r) + symbol
+        price = round(rng.uniform(1, 500), 2)
+        shares = rng.randint(1_000_000, 5_000_000_000)
+        if drift:
+            price = round(max(0.01, price * (1 + move.uniform(-drift, drift))), 2)
+        industry = "" if rng.random() < 0.1 else rng.choice(INDUSTRIES)
+        rows.append({
+            "symbol": symbol,
+            "name": f"{symbol} Holdings Inc. Common Stock",
+            "lastsale": f"${price:,.2f}",
+            "marketCap": f"{price * shares:,.2f}",
+            "industry": industry,
+        })
+    return rows
+
+
+class ScreenerStub:
+    """Threaded HTTP server holding one row list per exchange; `set_rows()` swaps a payload."""
+
+    def __init__(self, rows: Optional[Dict[str, List[Dict]]] = None, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0):
+        self.latency = latency
+        self.requests: Dict[str, int] = {}
+        self.bytes_sent: Dict[str, int] = {}
+        self._payloads: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        for exch, exch_rows in (rows or {}).items():
+            self.set_rows(exch, exch_rows)
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PATH}"
+
+    def set_rows(self, exch: str, rows: List[Dict]) -> None:
+        body = json.dumps({"data": {"headers": {}, "rows": rows}, "message": None}).encode("utf-8")
+        with self._lock:
+            self._payloads[exch] = body
+
+    def start(self) -> "ScreenerStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "ScreenerStub":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                exch = parse_qs(parts.query).get("exchange", [""])[0]
+                with stub._lock:
+                    body = stub._payloads.get(exch) if parts.path == API_PATH else None
+                    stub.requests[exch] = stub.requests.get(exch, 0) + 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if body is None:
+                    self.send_error(404)
+                    return
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+                with stub._lock:
+                    stub.bytes_sent[exch] = stub.bytes_sent.get(exch, 0) + len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
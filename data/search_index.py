@@ -0,0 +1,165 @@
+"""
+Trigram substring index behind StockDatasetUpdater.search() and `<stem>.search.json`.
+
+    index = SearchIndex.build(table)
+    [index.tickers[i] for i in index.search("bank", limit=5)]
+"""
+import base64
+import hashlib
+from bisect import bisect_left, bisect_right
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from update_stocks import StockTable
+
+
+class SearchIndex:
+    """
+    Substring search over ticker / name / industry, row ids = positions in the on-disk (ticker-sorted) order.
+
+    - queries of 3+ chars: walk the shortest trigram posting of the query in row order and
+      confirm the substring on each candidate;
+    - 1-2 char queries: no postings; they match most rows, so a str.find scan over the joined
+      texts in row order stops early.
+    Either way the matches are those of a linear `q in text` scan, as in script.js's search.
+    Results rank an exact ticker first, then ticker prefixes (a contiguous range, since rows are
+    ticker-sorted), then row order; the walk stops as soon as `limit` results are found.
+    Postings are serialized as base64 varints of the gaps between ascending row ids and decoded
+    on first use, with a digest of the indexed texts so a stale file can be detected without
+    rebuilding, and a FORMAT number so a file in an older layout is rebuilt.
+    """
+
+    FIELDS = ("ticker", "name", "industry")
+    FORMAT = 3
+
+    def __init__(self, tickers: List[str], texts: List[str], trigrams: Dict[str, Union[List[int], str]]):
+        self.tickers = tickers
+        self.texts = texts
+        self.trigrams = trigrams  # trigram -> row ids, or their encoding until first used
+        self._joined: Optional[Tuple[str, List[int]]] = None  # for _scan, built on first use
+        self.digest = self.texts_digest(texts)
+
+    @staticmethod
+    def texts_digest(texts: List[str]) -> str:
+        return hashlib.sha256("\n".join(texts).encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def _texts(cls, table: "StockTable") -> Tuple[List[str], List[str]]:
+        rows = table.sorted_rows()
+        names = table.columns["name"]
+        tickers = [table.tickers[r] for r in rows]
+        texts = [f"{table.tickers[r]} {names[r]} {table.industry_of(r)}".lower() for r in rows]
+        return tickers, texts
+
+    @classmethod
+    def build(cls, table: "StockTable") -> "SearchIndex":
+        tickers, texts = cls._texts(table)
+        trigrams: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            for g in {text[j:j + 3] for j in range(len(text) - 2)}:
+                trigrams.setdefault(g, []).append(i)
+        return cls(tickers, texts, trigrams)
+
+    def search(self, query: str, limit: int = 20) -> List[int]:
+        q = (query or "").strip().lower()
+        if not q or limit <= 0:
+            return []
+        texts = self.texts
+        if len(q) >= 3:
+            grams = {q[j:j + 3] for j in range(len(q) - 2)}
+            if not all(g in self.trigrams for g in grams):
+                return []
+            # an encoded posting's length tracks its row count, so nothing is decoded to pick one
+            candidates = self._posting(min(grams, key=lambda g: len(self.trigrams[g])))
+            matches = (lambda i: q in texts[i]) if len(q) > 3 else (lambda i: True)
+        else:
+            candidates = self._scan(q)
+            matches = lambda i: True  # noqa: E731
+
+        # ticker-prefix rows first (exact ticker at the front); rows are sorted by ticker
+        qu = q.upper()
+        lo = bisect_left(self.tickers, qu)
+        hi = bisect_left(self.tickers, qu + "\uffff")
+        head = [i for i in range(lo, hi) if matches(i) and q in texts[i]]
+        if head and self.tickers[head[0]] != qu:
+            exact = [i for i in head if self.tickers[i] == qu]
+            head = exact + [i for i in head if self.tickers[i] != qu]
+        out = head[:limit]
+        for i in candidates:
+            if len(out) >= limit:
+                break
+            if (i < lo or i >= hi) and matches(i):
+                out.append(i)
+        return out
+
+    def _scan(self, q: str) -> Iterator[int]:
+        """Rows containing `q`, in order, found with str.find over all texts joined by NULs."""
+        if self._joined is None:
+            starts, pos = [], 0
+            for text in self.texts:
+                starts.append(pos)
+                pos += len(text) + 1
+            self._joined = ("\0".join(self.texts), starts)
+        joined, starts = self._joined
+        pos = joined.find(q)
+        while pos >= 0:
+            i = bisect_right(starts, pos) - 1
+            if q in self.texts[i]:  # a query with a NUL could straddle two texts
+                yield i
+            if i + 1 == len(starts):
+                return
+            pos = joined.find(q, starts[i + 1])
+
+    def _posting(self, gram: str) -> List[int]:
+        posting = self.trigrams[gram]
+        if isinstance(posting, str):
+            posting = self.trigrams[gram] = self._decode(posting)
+        return posting
+
+    @staticmethod
+    def _encode(posting: List[int]) -> str:
+        out = bytearray()
+        prev = 0
+        for i in posting:
+            gap, prev = i - prev, i
+            while gap >= 0x80:
+                out.append(gap & 0x7F | 0x80)
+                gap >>= 7
+            out.append(gap)
+        return base64.b64encode(out).decode("ascii")
+
+    @staticmethod
+    def _decode(encoded: str) -> List[int]:
+        out = []
+        acc = gap = shift = 0
+        for b in base64.b64decode(encoded):
+            gap |= (b & 0x7F) << shift
+            if b & 0x80:
+                shift += 7
+                continue
+            acc += gap
+            out.append(acc)
+            gap = shift = 0
+        return out
+
+    def to_json(self) -> Dict:
+        return {
+            "format": self.FORMAT,  # format and texts_sha first: readers peek at the file head
+            "texts_sha": self.digest,
+            "fields": list(self.FIELDS),
+            "tickers": self.tickers,
+            "trigrams": {g: p if isinstance(p, str) else self._encode(p) for g, p in self.trigrams.items()},
+        }
+
+    @classmethod
+    def from_json(cls, doc: Dict, table: "StockTable") -> "SearchIndex":
+        """
+        Rebuild from `to_json()` output; the texts used to confirm matches come from `table`.
+        Postings stay encoded until a query needs them.
+        """
+        if doc.get("format") != cls.FORMAT:
+            raise ValueError("search index has an older format")
+        tickers, texts = cls._texts(table)
+        if doc.get("texts_sha") != cls.texts_digest(texts):
+            raise ValueError("search index does not match the dataset")
+        return cls(tickers, texts, doc["trigrams"])
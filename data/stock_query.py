@@ -0,0 +1,353 @@
+"""
+Server-side version of the stocks table filters in script.js.
+
+Same grammar as rowMatchesFilters() / sortRows():
+  - numeric columns (market_cap, current_price, target_price, rating): ">100", "<=2.5B",
+    "10-20", or text matched against the "$1,234.00" rendering;
+  - last_updated: ">=2025-01-01", "2025-01-01 - 2025-03-31", or an exact date;
+  - presence on rating / strategy / target_price: "*"/"has", "empty"/"!*", "nonzero";
+  - name / ticker / industry / strategy: case-insensitive substring;
+  - global: substring of the row's combined text.
+Like the stocks page, rows without last_updated are excluded unless covered_only=False.
+
+Comparisons and ranges use bisect over sorted column indexes; industry filters test the
+distinct industries once and take their rows from a hash index. Sorting walks the
+pre-sorted column order, so a page of results never sorts the whole table.
+
+    q = StockQuery.from_json("data/stocks.json")
+    q.query({"market_cap": ">10B", "industry": "bank"}, sort=("market_cap", "desc"), limit=20)
+"""
+import json
+import math
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from update_stocks import StockTable
+
+NUMERIC_COLUMNS = ("market_cap", "current_price", "target_price", "rating")
+TEXT_COLUMNS = ("name", "ticker", "industry")
+FILTER_COLUMNS = TEXT_COLUMNS + NUMERIC_COLUMNS + ("last_updated", "strategy")
+
+_AMOUNT = r"\d*\.?\d+\s*[KMBT]?"
+_NUM_RANGE_RE = re.compile(rf"^({_AMOUNT})\s*-\s*({_AMOUNT})$")
+_NUM_CMP_RE = re.compile(rf"^(>=|>|<=|<)\s*({_AMOUNT})$")
+_DATE = r"\d{4}-\d{2}-\d{2}"
+_DATE_RANGE_RE = re.compile(rf"^({_DATE})\s*-\s*({_DATE})$")
+_DATE_CMP_RE = re.compile(rf"^(>=|>|<=|<)\s*({_DATE})$")
+_ISO_DATE_RE = re.compile(rf"^{_DATE}$")
+_RATING_NUM_RE = re.compile(r"-?\d+(?:\.\d+)?")
+_PRESENCE = ("*", "has", "nonzero", "empty", "!*")
+
+
+def parse_date(s: str) -> float:
+    """'YYYY-MM-DD' -> day ordinal; NaN otherwise (only ISO dates are accepted)."""
+    s = (s or "").strip()
+    if not _ISO_DATE_RE.match(s):
+        return math.nan
+    try:
+        return float(date.fromisoformat(s).toordinal())
+    except ValueError:
+        return math.nan
+
+
+def fmt_money(n: float) -> str:
+    """fmtMoney() in script.js: '$1,234.50'."""
+    return f"${n:,.2f}"
+
+
+def is_presence_query(q: str) -> bool:
+    return bool(q) and q.strip().lower() in _PRESENCE
+
+
+def matches_presence(raw: str, num: float, q: str) -> bool:
+    s = q.strip().lower()
+    has = bool(raw and raw.strip())
+    if s in ("*", "has"):
+        return has
+    if s in ("empty", "!*"):
+        return not has
+    if s == "nonzero":
+        return num != 0 if not math.isnan(num) else has
+    return True
+
+
+def matches_numeric(val: float, q: str) -> bool:
+    """matchesNumericFilter() in script.js."""
+    if not q:
+        return True
+    Q = q.strip().upper()
+    if math.isnan(val):
+        return False
+    m = _NUM_RANGE_RE.match(Q)
+    if m:
+        return StockTable.parse_money(m.group(1)) <= val <= StockTable.parse_money(m.group(2))
+    m = _NUM_CMP_RE.match(Q)
+    if m:
+        return _compare(val, m.group(1), StockTable.parse_money(m.group(2)))
+    return Q in fmt_money(val).upper()
+
+
+def matches_date(ts: float, q: str) -> bool:
+    """matchesDateFilter() in script.js."""
+    if not q:
+        return True
+    Q = q.strip()
+    if math.isnan(ts):
+        return False
+    m = _DATE_RANGE_RE.match(Q)
+    if m:
+        lo, hi = parse_date(m.group(1)), parse_date(m.group(2))
+        return not math.isnan(lo) and not math.isnan(hi) and lo <= ts <= hi
+    m = _DATE_CMP_RE.match(Q)
+    if m:
+        t = parse_date(m.group(2))
+        return not math.isnan(t) and _compare(ts, m.group(1), t)
+    exact = parse_date(Q)
+    return not math.isnan(exact) and ts == exact
+
+
+def _compare(a: float, op: str, b: float) -> bool:
+    if op == ">":
+        return a > b
+    if op == ">=":
+        return a >= b
+    if op == "<":
+        return a < b
+    return a <= b
+
+
+class StockQuery:
+    """Read-only, indexed view of the dataset; rows are numbered in on-disk (ticker) order."""
+
+    def __init__(self, table: StockTable):
+        order = table.sorted_rows()
+        cols = table.columns
+        self.table = table
+        self.rows = order  # query row id -> table row
+        self.text = {
+            "name": [cols["name"][r] for r in order],
+            "ticker": [table.tickers[r] for r in order],
+            "industry": [table.industry_of(r) for r in order],
+            "last_updated": [cols["last_updated"][r] for r in order],
+            "rating": [cols["rating"][r].strip() for r in order],
+            "strategy": [cols["strategy"][r].strip() for r in order],
+            "market_cap": [cols["market_cap"][r] for r in order],
+            "current_price": [cols["current_price"][r] for r in order],
+            "target_price": [cols["target_price"][r] for r in order],
+        }
+        self.lower = {k: [v.lower() for v in self.text[k]] for k in ("name", "ticker", "industry", "rating", "strategy")}
+        self.values: Dict[str, List[float]] = {
+            "market_cap": [StockTable.parse_money(v) for v in self.text["market_cap"]],
+            "current_price": [StockTable.parse_money(v) for v in self.text["current_price"]],
+            "target_price": [StockTable.parse_money(v) for v in self.text["target_price"]],
+            "rating": [self._rating_value(v) for v in self.text["rating"]],
+            "last_updated": [parse_date(v) for v in self.text["last_updated"]],
+        }
+        # sorted (value, row) per column, NaN excluded
+        self.sorted_index: Dict[str, List[Tuple[float, int]]] = {
+            col: sorted((v, i) for i, v in enumerate(vals) if not math.isnan(v))
+            for col, vals in self.values.items()
+        }
+        self.industry_index: Dict[str, List[int]] = {}
+        for i, ind in enumerate(self.lower["industry"]):
+            self.industry_index.setdefault(ind, []).append(i)
+        self.covered = frozenset(i for i, v in enumerate(self.text["last_updated"]) if v.strip())
+        self._sort_orders: Dict[Tuple[str, str], List[int]] = {}
+
+    @classmethod
+    def from_json(cls, path: str) -> "StockQuery":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(StockTable.from_records(json.load(f)))
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "StockQuery":
+        return cls(StockTable.from_records(records))
+
+    # ---------------- Public API ----------------
+
+    def query(self, filters: Optional[Dict[str, str]] = None, global_query: str = "",
+              sort: Tuple[str, str] = ("name", "asc"), offset: int = 0, limit: Optional[int] = 50,
+              covered_only: bool = True) -> Dict:
+        """
+        Filter, sort and paginate. `filters` maps column -> filter text (as typed in the table
+        header); `sort` is (column, "asc"|"desc"). Returns {"total", "offset", "limit", "rows"}.
+        """
+        matched = self.match(filters or {}, global_query, covered_only)
+        ordered = self.sorted_page(matched, sort, offset, limit)
+        return {
+            "total": len(matched),
+            "offset": offset,
+            "limit": limit,
+            "rows": [self.table.record(self.rows[i]) for i in ordered],
+        }
+
+    def match(self, filters: Dict[str, str], global_query: str = "", covered_only: bool = True) -> Set[int]:
+        """Row ids matching every filter."""
+        sets: List[Set[int]] = []
+        preds: List[Callable[[int], bool]] = []
+        if covered_only:
+            sets.append(set(self.covered))
+        for col, q in filters.items():
+            if col not in FILTER_COLUMNS:
+                raise ValueError(f"Unknown filter column {col!r}; expected one of {FILTER_COLUMNS}")
+            q = (q or "").strip().lower()  # the page lower-cases filter inputs
+            if not q:
+                continue
+            indexed = self._indexed_rows(col, q)
+            if indexed is not None:
+                sets.append(indexed)
+            else:
+                preds.append(self._predicate(col, q))
+        g = (global_query or "").strip().lower()
+        if g:
+            preds.append(lambda i: g in self._blob(i))
+
+        if sets:
+            sets.sort(key=len)
+            result = set(sets[0])
+            for other in sets[1:]:
+                result &= other
+        else:
+            result = set(range(len(self.rows)))
+        for pred in preds:
+            result = {i for i in result if pred(i)}
+        return result
+
+    def sorted_page(self, matched: Set[int], sort: Tuple[str, str] = ("name", "asc"),
+                    offset: int = 0, limit: Optional[int] = None) -> List[int]:
+        """
+        The `offset:offset+limit` slice of `matched` in sortRows() order: numeric/date columns
+        with NaN last in both directions, text case-insensitive, ties in on-disk order.
+        """
+        key, direction = sort
+        if key not in FILTER_COLUMNS:
+            raise ValueError(f"Unknown sort column {key!r}")
+        stop = None if limit is None else offset + limit
+        out: List[int] = []
+        for i in self._sort_order(key, direction):
+            if i in matched:
+                out.append(i)
+                if stop is not None and len(out) >= stop:
+                    break
+        return out[offset:stop]
+
+    # ---------------- Filters ----------------
+
+    def _indexed_rows(self, col: str, q: str) -> Optional[Set[int]]:
+        """Rows for filters an index can answer exactly; None when a row-by-row check is needed."""
+        if col == "industry":
+            rows: Set[int] = set()
+            for ind, ids in self.industry_index.items():
+                if q in ind:
+                    rows.update(ids)
+            return rows
+        if col == "last_updated":
+            m = _DATE_RANGE_RE.match(q)
+            if m:
+                return self._range("last_updated", parse_date(m.group(1)), parse_date(m.group(2)))
+            m = _DATE_CMP_RE.match(q)
+            if m:
+                return self._compare_rows("last_updated", m.group(1), parse_date(m.group(2)))
+            exact = parse_date(q)
+            return self._range("last_updated", exact, exact)
+        if col in ("market_cap", "current_price") or (col == "target_price" and not is_presence_query(q)):
+            Q = q.upper()
+            m = _NUM_RANGE_RE.match(Q)
+            if m:
+                return self._range(col, StockTable.parse_money(m.group(1)), StockTable.parse_money(m.group(2)))
+            m = _NUM_CMP_RE.match(Q)
+            if m:
+                return self._compare_rows(col, m.group(1), StockTable.parse_money(m.group(2)))
+        return None
+
+    def _predicate(self, col: str, q: str) -> Callable[[int], bool]:
+        if col in TEXT_COLUMNS:
+            lower = self.lower[col]
+            return lambda i: q in lower[i]
+        if col == "strategy":
+            if is_presence_query(q):
+                return lambda i: matches_presence(self.text["strategy"][i], math.nan, q)
+            return lambda i: q in self.lower["strategy"][i]
+        if col == "rating":
+            vals, raw, lower = self.values["rating"], self.text["rating"], self.lower["rating"]
+            if is_presence_query(q):
+                return lambda i: matches_presence(raw[i], vals[i], q)
+            return lambda i: matches_numeric(vals[i], q) if not math.isnan(vals[i]) else q in lower[i]
+        if col == "target_price" and is_presence_query(q):
+            vals, raw = self.values["target_price"], self.text["target_price"]
+            return lambda i: matches_presence(raw[i], vals[i], q)
+        vals = self.values[col]
+        return lambda i: matches_numeric(vals[i], q)
+
+    def _range(self, col: str, lo: float, hi: float) -> Set[int]:
+        if math.isnan(lo) or math.isnan(hi):
+            return set()
+        idx = self.sorted_index[col]
+        a = bisect_left(idx, (lo, -1))
+        b = bisect_right(idx, (hi, len(self.rows)))
+        return {i for _, i in idx[a:b]}
+
+    def _compare_rows(self, col: str, op: str, n: float) -> Set[int]:
+        if math.isnan(n):
+            return set()
+        idx = self.sorted_index[col]
+        if op == ">":
+            return {i for _, i in idx[bisect_right(idx, (n, len(self.rows))):]}
+        if op == ">=":
+            return {i for _, i in idx[bisect_left(idx, (n, -1)):]}
+        if op == "<":
+            return {i for _, i in idx[:bisect_left(idx, (n, -1))]}
+        return {i for _, i in idx[:bisect_right(idx, (n, len(self.rows)))]}
+
+    # ---------------- Sorting ----------------
+
+    def _sort_order(self, key: str, direction: str) -> List[int]:
+        """All row ids in sortRows() order for (key, direction); computed once per engine."""
+        cache_key = (key, direction)
+        order = self._sort_orders.get(cache_key)
+        if order is not None:
+            return order
+        desc = direction == "desc"
+        if key in self.values:
+            idx = self.sorted_index[key]
+            if desc:
+                # descending by value, ties keep on-disk order (stable sort in the browser)
+                order = [i for _, i in sorted(idx, key=lambda p: (-p[0], p[1]))]
+            else:
+                order = [i for _, i in idx]
+            present = set(order)
+            order += [i for i in range(len(self.rows)) if i not in present]  # NaN last either way
+        else:
+            col = self.lower.get(key) or [v.lower() for v in self.text[key]]
+            order = sorted(range(len(self.rows)), key=col.__getitem__)
+            if desc:
+                order = self._reverse_stable(order, col)
+        self._sort_orders[cache_key] = order
+        return order
+
+    @staticmethod
+    def _reverse_stable(order: List[int], col: List[str]) -> List[int]:
+        """Reverse an ascending order while keeping equal keys in their original order."""
+        out: List[int] = []
+        j = len(order)
+        while j > 0:
+            i = j - 1
+            while i > 0 and col[order[i - 1]] == col[order[j - 1]]:
+                i -= 1
+            out.extend(order[i:j])
+            j = i
+        return out
+
+    # ---------------- Helpers ----------------
+
+    @staticmethod
+    def _rating_value(raw: str) -> float:
+        m = _RATING_NUM_RE.search(raw or "")
+        return float(m.group(0)) if m else math.nan
+
+    def _blob(self, i: int) -> str:
+        t = self.text
+        return (f"{t['name'][i]} {t['ticker'][i]} {t['industry'][i]} {t['rating'][i]} {t['strategy'][i]} "
+                f"{t['market_cap'][i]} {t['last_updated'][i]} {t['current_price'][i]} {t['target_price'][i]}").lower()
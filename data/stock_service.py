@@ -0,0 +1,382 @@
+"""
+Long-running local JSON service around StockDatasetUpdater (stdlib asyncio only).
+
+The dataset stays resident as a StockQuery (ticker index + sorted column indexes). Writes go
+through the updater on a worker thread, one at a time; afterwards a fresh StockQuery is built
+off the event loop and swapped in, so readers never wait on a write.
+
+  GET  /health                 row counts, pending edits, last refresh
+  GET  /stocks?...             filter/sort/paginate (see stock_query.py):
+                               <column>=<filter text>, q=<global>, sort=<column>, dir=asc|desc,
+                               offset=, limit= (max MAX_LIMIT), all=1 to include rows without last_updated
+  GET  /stocks/<TICKER>        one record
+  POST /edits                  [{"ticker", "field", "value"}, ...]; validated (400 on a bad edit), then
+                               queued and written together after `debounce` seconds without new edits
+                               (at most `max_delay` after the first). 202 {"queued"}; with ?wait=1,
+                               200 {"applied"} once written. Each request is all-or-nothing: if the
+                               combined write fails, requests are retried one by one and only the
+                               failing ones are dropped (400 with ?wait=1; see last_edit_error).
+  POST /refresh                run update_json() now; with ?wait=1, 200 with the change counts.
+
+`refresh_interval` (seconds) also runs update_json() on a schedule.
+
+    python stock_service.py --port 8765 --refresh-interval 3600
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from stock_query import FILTER_COLUMNS, StockQuery
+from update_stocks import DEFAULT_JSON, StockDatasetUpdater
+
+MAX_LIMIT = 1000
+MAX_BODY = 8 * 1024 * 1024
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class StockService:
+    def __init__(
+        self,
+        updater: StockDatasetUpdater,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        refresh_interval: Optional[float] = None,
+        debounce: float = 0.5,
+        max_delay: float = 5.0,
+        logger: Optional[logging.Logger] = None,
+    ):
+        self.updater = updater
+        self.host = host
+        self.port = port
+        self.refresh_interval = refresh_interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.logger = logger or updater.logger
+        self.engine: Optional[StockQuery] = None
+        self.last_refresh: Optional[float] = None
+        self.last_refresh_error: Optional[str] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._edits: List[Tuple[List[Dict], asyncio.Future]] = []  # (one request's edits, its waiter)
+        self.last_edit_error: Optional[str] = None
+        self._first_edit = 0.0
+        self._last_edit = 0.0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    # ---------------- Lifecycle ----------------
+
+    async def start(self) -> None:
+        self._write_lock = asyncio.Lock()
+        await self.reload()
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.refresh_interval:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+        self.logger.info("Serving %d records on http://%s:%d", len(self.engine.rows), self.host, self.port)
+
+    async def stop(self) -> None:
+        """Stop accepting requests, write any queued edits, and cancel the refresh schedule."""
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._refresh_task:
+            self._refresh_task.cancel()
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self._edits:
+            await self._flush()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    # ---------------- Dataset ----------------
+
+    async def reload(self) -> None:
+        """Rebuild the resident index from the updater's current table and swap it in."""
+        loop = asyncio.get_running_loop()
+        self.engine = await loop.run_in_executor(None, lambda: StockQuery(self.updater.table()))
+
+    async def refresh(self) -> Dict:
+        """update_json() on a worker thread, then reload. Returns the change counts."""
+        loop = asyncio.get_running_loop()
+        async with self._write_lock:
+            try:
+                changes = await loop.run_in_executor(None, self.updater.update_json)
+            except Exception as e:
+                self.last_refresh_error = f"{type(e).__name__}: {e}"
+                raise
+            self.last_refresh = time.time()
+            self.last_refresh_error = None
+            await self.reload()
+        return {k: len(v) for k, v in changes.items()}
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                self.logger.exception("Scheduled refresh failed")
+
+    @property
+    def pending_edits(self) -> int:
+        return sum(len(edits) for edits, _ in self._edits)
+
+    def queue_edits(self, edits: List[Dict]) -> asyncio.Future:
+        """
+        Validate and queue one request's edits for the next debounced write; the future resolves
+        to the number of edits written together with them, or fails with HTTPError(400).
+        """
+        for edit in edits:
+            if isinstance(edit, dict) and edit.get("field") not in StockDatasetUpdater.EDIT_FIELDS:
+                raise HTTPError(400, f"Unsupported edit field {edit.get('field')!r}; "
+                                     f"expected one of {StockDatasetUpdater.EDIT_FIELDS}")
+            try:
+                StockDatasetUpdater.check_edit(edit)
+            except ValueError as e:
+                raise HTTPError(400, str(e))
+        now = asyncio.get_running_loop().time()
+        if not self._edits:
+            self._first_edit = now
+        self._last_edit = now
+        waiter = asyncio.get_running_loop().create_future()
+        self._edits.append((edits, waiter))
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return waiter
+
+    async def _flush_later(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            due = min(self._last_edit + self.debounce, self._first_edit + self.max_delay)
+            if loop.time() >= due:
+                break
+            await asyncio.sleep(due - loop.time())
+        self._flush_task = None
+        await self._flush()
+
+    async def _flush(self) -> None:
+        queued, self._edits = self._edits, []
+        loop = asyncio.get_running_loop()
+        results: List[Tuple[asyncio.Future, object]] = []
+        async with self._write_lock:
+            try:
+                count = await loop.run_in_executor(
+                    None, self.updater.apply_edits, [e for edits, _ in queued for e in edits])
+                results = [(w, count) for _, w in queued]
+            except Exception as e:
+                if len(queued) == 1:
+                    results = [(queued[0][1], self._edit_failure(queued[0][0], e))]
+                else:
+                    # one bad request must not sink the others: write each on its own
+                    self.logger.warning("Writing %d queued requests together failed (%s); retrying one by one",
+                                        len(queued), e)
+                    for edits, w in queued:
+                        try:
+                            results.append((w, await loop.run_in_executor(None, self.updater.apply_edits, edits)))
+                        except Exception as err:
+                            results.append((w, self._edit_failure(edits, err)))
+            if any(not isinstance(r, Exception) for _, r in results):
+                await self.reload()
+        for w, result in results:
+            if w.done():
+                continue
+            if isinstance(result, Exception):
+                w.set_exception(result)
+            else:
+                w.set_result(result)
+
+    def _edit_failure(self, edits: List[Dict], error: Exception) -> HTTPError:
+        self.logger.error("Dropped %d edit(s) that could not be written: %s", len(edits), error)
+        self.last_edit_error = f"{type(error).__name__}: {error}"
+        status = 400 if isinstance(error, (ValueError, KeyError)) else 500
+        return HTTPError(status, f"Edits not written: {error}")
+
+    # ---------------- HTTP ----------------
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    self._write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                try:
+                    status, payload = await self._dispatch(method, target, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    self.logger.exception("%s %s failed", method, target)
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers: Dict[str, str] = {}
+        while True:
+            h = await reader.readline()
+            if h in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = h.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "Content-Length must be an integer")
+        if length < 0:
+            raise HTTPError(400, "Content-Length must not be negative")
+        if length > MAX_BODY:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, object]:
+        parts = urlsplit(target)
+        path = parts.path.rstrip("/") or "/"
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        wait = params.get("wait") in ("1", "true")
+
+        if path == "/health":
+            return 200, self._health()
+        if path == "/stocks":
+            self._require(method, "GET")
+            return 200, self._query(params)
+        if path.startswith("/stocks/"):
+            self._require(method, "GET")
+            return self._lookup(unquote(path[len("/stocks/"):]))
+        if path == "/edits":
+            self._require(method, "POST")
+            try:
+                doc = json.loads(body or b"[]")
+            except ValueError:
+                raise HTTPError(400, "Body must be JSON")
+            edits = doc.get("edits") if isinstance(doc, dict) and "edits" in doc else doc
+            edits = edits if isinstance(edits, list) else [edits]
+            waiter = self.queue_edits(edits)
+            if not wait:
+                waiter.add_done_callback(lambda f: f.cancelled() or f.exception())  # failure is logged
+                return 202, {"queued": len(edits), "pending": self.pending_edits}
+            return 200, {"applied": len(edits), "batch": await waiter}
+        if path == "/refresh":
+            self._require(method, "POST")
+            task = asyncio.create_task(self.refresh())
+            if not wait:
+                task.add_done_callback(self._log_task_error)
+                return 202, {"refreshing": True}
+            return 200, await task
+        raise HTTPError(404, f"No route for {path}")
+
+    @staticmethod
+    def _require(method: str, expected: str) -> None:
+        if method != expected:
+            raise HTTPError(405, f"Use {expected}")
+
+    def _log_task_error(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error("Refresh failed: %s", task.exception())
+
+    def _health(self) -> Dict:
+        engine = self.engine
+        return {
+            "records": len(engine.rows) if engine else 0,
+            "covered": len(engine.covered) if engine else 0,
+            "pending_edits": self.pending_edits,
+            "last_edit_error": self.last_edit_error,
+            "last_refresh": self.last_refresh,
+            "last_refresh_error": self.last_refresh_error,
+            "writing": bool(self._write_lock and self._write_lock.locked()),
+        }
+
+    def _query(self, params: Dict[str, str]) -> Dict:
+        try:
+            offset = max(0, int(params.get("offset", 0)))
+            limit = min(MAX_LIMIT, max(0, int(params.get("limit", 50))))
+        except ValueError:
+            raise HTTPError(400, "offset and limit must be integers")
+        direction = params.get("dir", "asc")
+        if direction not in ("asc", "desc"):
+            raise HTTPError(400, "dir must be asc or desc")
+        sort = params.get("sort", "name")
+        if sort not in FILTER_COLUMNS:
+            raise HTTPError(400, f"Unknown sort column {sort!r}")
+        filters = {col: params[col] for col in FILTER_COLUMNS if col in params}
+        return self.engine.query(filters, params.get("q", ""), (sort, direction), offset, limit,
+                                 covered_only=params.get("all") not in ("1", "true"))
+
+    def _lookup(self, ticker: str) -> Tuple[int, object]:
+        engine = self.engine
+        row = engine.table.row_of(ticker.strip().upper())
+        if row is None:
+            raise HTTPError(404, f"Unknown ticker {ticker!r}")
+        return 200, engine.table.record(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve data/stocks.json as a local JSON API.")
+    parser.add_argument("--json", default=DEFAULT_JSON, help="dataset path (default: stocks.json next to this script)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--refresh-interval", type=float, default=0, help="seconds between update_json() runs (0 = off)")
+    parser.add_argument("--debounce", type=float, default=0.5, help="seconds of quiet before queued edits are written")
+    parser.add_argument("--api-url", default=None, help="screener endpoint (default: Nasdaq)")
+    args = parser.parse_args()
+    if not Path(args.json).is_file():
+        parser.error(f"no dataset at {args.json}")
+
+    updater = StockDatasetUpdater(json_path=args.json, api_url=args.api_url)
+    service = StockService(updater, args.host, args.port, args.refresh_interval or None, args.debounce)
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+`_normalize_rows` (column batches) must give exactly what the per-row `_normalize_row` gives.
+
+    python -m pytest data/test_normalize.py
+"""
+import logging
+import random
+
+import pytest
+
+from update_stocks import StockDatasetUpdater
+
+CAPS = ["", None, "NA", "0", "12", "999.4", "999.996", "1,000", "1,234", "12,345,678.00", "-5000000",
+        "-0.5", "1e15", "3,830,000,000,000", "  42  ", "inf", "-inf", "nan?", "1.2.3"]
+PRICES = ["$12.34", "", None, "$0.9499", "N/A", "12", "$1,234.50", 7.5, 0, "-$3.10", "abc"]
+SYMBOLS = [" aapl ", "", None, "BRK/A", "brk.b", "  ", "DUP", "DUP"]
+INDUSTRIES = ["", None, "Banks", "  Semiconductors  "]
+
+
+def messy_rows(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        row = {
+            "symbol": rng.choice(SYMBOLS) if i % 7 == 0 else f"T{i}",
+            "name": rng.choice([None, "", f"  Name {i} "]),
+            "marketCap": rng.choice(CAPS) if i % 3 == 0 else f"{rng.uniform(-1e3, 5e12):,.2f}",
+            "lastsale": rng.choice(PRICES) if i % 2 == 0 else f"${rng.uniform(0, 900):.2f}",
+            "industry": rng.choice(INDUSTRIES),
+        }
+        if i % 11 == 0:
+            row["sector"] = "Finance"
+        if i % 13 == 0:
+            del row[rng.choice(["marketCap", "lastsale", "name", "industry"])]
+        rows.append(row)
+    return rows
+
+
+def per_row(updater, rows):
+    out = {}
+    for row in rows:
+        rec = updater._normalize_row(row)
+        if rec is not None:
+            out[rec["ticker"]] = rec  # last row per ticker wins
+    return out
+
+
+@pytest.fixture
+def updater(tmp_path):
+    return StockDatasetUpdater(str(tmp_path / "stocks.json"), logger=logging.getLogger("test_normalize"))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_batches_match_per_row(updater, seed):
+    rows = messy_rows(3 * StockDatasetUpdater.NORMALIZE_BATCH + 17, seed)
+    assert updater._normalize_rows(iter(rows)) == per_row(updater, rows)
+
+
+def test_every_cap_and_price_variant(updater):
+    rows = [{"symbol": f"C{i}", "marketCap": cap, "lastsale": price}
+            for i, (cap, price) in enumerate((c, p) for c in CAPS for p in PRICES)]
+    assert updater._normalize_rows(rows) == per_row(updater, rows)
+
+
+def test_fmt_market_caps_matches_scalar():
+    raws = [(c or "").replace(",", "").strip() for c in CAPS] + [str(10 ** k) for k in range(16)]
+    expected = [StockDatasetUpdater._fmt_market_cap(StockDatasetUpdater._safe_float(s)) for s in raws]
+    assert StockDatasetUpdater._fmt_market_caps(raws) == expected
+
+
+def test_nan_cap_fails_the_same_way(updater):
+    rows = [{"symbol": "X", "marketCap": "nan", "lastsale": "$1"}]
+    with pytest.raises(ValueError):
+        per_row(updater, rows)
+    with pytest.raises(ValueError):
+        updater._normalize_rows(rows)
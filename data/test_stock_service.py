@@ -0,0 +1,229 @@
+"""
+StockService over HTTP: debounced edit batches, per-request fallback, 400s and /refresh against a ScreenerStub.
+
+    python -m pytest data/test_stock_service.py
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pytest
+
+from screener_stub import ScreenerStub, synthetic_rows
+from stock_service import StockService
+from update_stocks import StockDatasetUpdater
+
+RECORDS = [
+    {"name": "Alpha Corp", "ticker": "AAA", "industry": "Banks", "market_cap": "1.00B",
+     "last_updated": "2024-01-02", "current_price": "$10.00", "target_price": "12"},
+    {"name": "Beta Inc", "ticker": "BBB", "industry": "Semiconductors", "market_cap": "2.00B",
+     "last_updated": "", "current_price": "$20.00", "target_price": ""},
+]
+
+
+class UrllibSession:
+    """The slice of requests.Session the updater uses, so /refresh runs without `requests`."""
+
+    def __init__(self):
+        self.headers = {}
+
+    def get(self, url, params=None, headers=None, timeout=None, stream=False):
+        req = urllib.request.Request(f"{url}?{urllib.parse.urlencode(params or {})}",
+                                     headers={**self.headers, **(headers or {})})
+        try:
+            return UrllibResponse(urllib.request.urlopen(req, timeout=timeout))
+        except urllib.error.HTTPError as e:
+            return UrllibResponse(e)
+
+
+class UrllibResponse:
+    def __init__(self, fp):
+        self.fp = fp
+        self.status_code = fp.status
+        self.headers = fp.headers
+
+    def iter_content(self, chunk_size):
+        return iter(lambda: self.fp.read(chunk_size), b"")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise OSError(f"HTTP {self.status_code}")
+
+    def close(self):
+        self.fp.close()
+
+
+class RecordingUpdater(StockDatasetUpdater):
+    """Remembers each apply_edits() call; a rating for ticker BAD fails only when it is written."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.applied = []
+
+    def apply_edits(self, edits):
+        edits = list(edits)
+        self.applied.append([e["ticker"] for e in edits])
+        return super().apply_edits(edits)
+
+    def set_rating(self, ticker, rating):
+        if ticker.strip().upper() == "BAD":
+            raise ValueError("BAD cannot be rated")
+        super().set_rating(ticker, rating)
+
+
+@pytest.fixture
+def updater(tmp_path):
+    json_path = tmp_path / "data" / "stocks.json"
+    json_path.parent.mkdir()
+    json_path.write_text(json.dumps(RECORDS), encoding="utf-8")
+    return RecordingUpdater(str(json_path), session=UrllibSession(), max_retries=0,
+                            logger=logging.getLogger("test_stock_service"))
+
+
+@contextlib.asynccontextmanager
+async def running(updater, **kwargs):
+    service = StockService(updater, port=0, **kwargs)
+    await service.start()
+    try:
+        yield service
+    finally:
+        await service.stop()
+
+
+async def call(service, method, path, body=None, headers=None):
+    """One HTTP/1.1 request (`body` is sent as JSON unless it is bytes); returns (status, JSON payload)."""
+    data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8") if body is not None else b""
+    head = {"Host": "localhost", "Connection": "close", "Content-Length": str(len(data)), **(headers or {})}
+    reader, writer = await asyncio.open_connection(service.host, service.port)
+    writer.write(f"{method} {path} HTTP/1.1\r\n".encode("latin-1")
+                 + "".join(f"{k}: {v}\r\n" for k, v in head.items()).encode("latin-1") + b"\r\n" + data)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    status_line, _, rest = raw.partition(b"\r\n")
+    return int(status_line.split()[1]), json.loads(rest.partition(b"\r\n\r\n")[2])
+
+
+def rating(updater, ticker):
+    return updater.table().get_field(ticker, "rating")
+
+
+def test_edits_within_debounce_are_written_together(updater):
+    async def scenario():
+        async with running(updater, debounce=0.2, max_delay=5) as service:
+            for ticker in ("AAA", "BBB"):
+                status, doc = await call(service, "POST", "/edits",
+                                         [{"ticker": ticker, "field": "rating", "value": "Buy"}])
+                assert (status, doc["queued"]) == (202, 1)
+            status, doc = await call(service, "POST", "/edits?wait=1",
+                                     [{"ticker": "AAA", "field": "target_price", "value": "15"}])
+            assert (status, doc) == (200, {"applied": 1, "batch": 3})
+            assert service.pending_edits == 0
+            status, doc = await call(service, "GET", "/stocks/aaa")
+            assert (status, doc["rating"], doc["target_price"]) == (200, "Buy", "15")
+
+    asyncio.run(scenario())
+    assert updater.applied == [["AAA", "BBB", "AAA"]]
+    assert rating(updater, "BBB") == "Buy"
+
+
+def test_max_delay_bounds_a_steady_stream_of_edits(updater):
+    async def scenario():
+        async with running(updater, debounce=0.15, max_delay=0.3) as service:
+            for _ in range(6):
+                await call(service, "POST", "/edits", [{"ticker": "AAA", "field": "rating", "value": "Hold"}])
+                await asyncio.sleep(0.1)
+            while service.pending_edits:
+                await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert len(updater.applied) >= 2
+    assert sum(len(batch) for batch in updater.applied) == 6
+
+
+def test_failed_batch_is_retried_per_request(updater):
+    async def scenario():
+        async with running(updater, debounce=0.1) as service:
+            return await asyncio.gather(
+                call(service, "POST", "/edits?wait=1", [{"ticker": "AAA", "field": "rating", "value": "Sell"}]),
+                call(service, "POST", "/edits?wait=1", [{"ticker": "BAD", "field": "rating", "value": "Buy"}]),
+                call(service, "POST", "/edits?wait=1", [{"ticker": "BBB", "field": "strategy", "value": "Long"}]),
+            ), service.last_edit_error
+
+    (good, bad, other), last_error = asyncio.run(scenario())
+    assert good == (200, {"applied": 1, "batch": 1})
+    assert other == (200, {"applied": 1, "batch": 1})
+    assert bad[0] == 400 and "BAD cannot be rated" in bad[1]["error"]
+    assert "BAD cannot be rated" in last_error
+    assert updater.applied == [["AAA", "BAD", "BBB"], ["AAA"], ["BAD"], ["BBB"]]
+    assert rating(updater, "AAA") == "Sell"
+    assert "BAD" not in updater.table()
+
+
+@pytest.mark.parametrize("body, headers, message", [
+    ([{"ticker": "AAA", "field": "last_updated", "value": "2024-13-45"}], None, "YYYY-MM-DD"),
+    ([{"ticker": "AAA", "field": "upsert"}], None, "Unsupported edit field 'upsert'"),
+    ([{"ticker": "AAA", "field": "price", "value": "1"}], None, "Unsupported edit field 'price'"),
+    ([{"field": "rating", "value": "Buy"}], None, "needs a ticker"),
+    (None, {"Content-Length": "abc"}, "must be an integer"),
+    (None, {"Content-Length": "-1"}, "must not be negative"),
+])
+def test_bad_requests_get_400(updater, body, headers, message):
+    async def scenario():
+        async with running(updater, debounce=0.05) as service:
+            result = await call(service, "POST", "/edits?wait=1", body, headers)
+            assert service.pending_edits == 0
+            return result
+
+    status, doc = asyncio.run(scenario())
+    assert status == 400 and message in doc["error"]
+    assert updater.applied == []
+
+
+def test_body_must_be_json(updater):
+    async def scenario():
+        async with running(updater) as service:
+            return await call(service, "POST", "/edits", b"abc")
+
+    assert asyncio.run(scenario()) == (400, {"error": "Body must be JSON"})
+
+
+def test_refresh_against_stub(updater):
+    exchanges = {"nyse": synthetic_rows(30, seed=1), "nasdaq": synthetic_rows(20, seed=2),
+                 "amex": synthetic_rows(10, seed=3)}
+
+    async def scenario():
+        async with running(updater) as service:
+            status, counts = await call(service, "POST", "/refresh?wait=1")
+            _, health = await call(service, "GET", "/health")
+            _, found = await call(service, "GET", "/stocks/" + exchanges["nyse"][0]["symbol"])
+            return status, counts, health, found
+
+    with ScreenerStub(exchanges) as stub:
+        updater.api_url = stub.url
+        status, counts, health, found = asyncio.run(scenario())
+        assert set(stub.requests) == set(exchanges)
+
+    assert status == 200 and counts["added"] > 0
+    assert health["records"] == len(updater.table())
+    assert health["last_refresh_error"] is None
+    assert found["ticker"] == exchanges["nyse"][0]["symbol"]
+
+
+def test_failed_refresh_is_reported(updater):
+    async def scenario():
+        async with running(updater) as service:
+            status, doc = await call(service, "POST", "/refresh?wait=1")
+            _, health = await call(service, "GET", "/health")
+            return status, doc, health
+
+    with ScreenerStub({}) as stub:
+        updater.api_url = stub.url
+        status, doc, health = asyncio.run(scenario())
+
+    assert status == 500 and "All exchanges failed" in doc["error"]
+    assert "All exchanges failed" in health["last_refresh_error"]
@@ -1,11 +1,319 @@
+import argparse
+import codecs
+import csv
+import functools
+import getpass
+import gzip
+import hashlib
 import json
 import logging
+import math
+import os
+import pickle
 import re
+import sys
+import threading
+import time
+from array import array
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-import requests
+from price_history import PriceHistory
+from search_index import SearchIndex
+from updater_metrics import UpdaterMetrics
+
+if TYPE_CHECKING:
+    import requests  # imported lazily by StockDatasetUpdater.session
+
+try:
+    import brotli  # optional: enables the .br publish artifact
+except ImportError:
+    brotli = None
+
+
+class StockTable(MutableMapping):
+    """
+    Column-backed ticker -> record table.
+
+    Behaves like Dict[str, Dict] for the updater (get/set/iterate records), but stores
+    each field as a column: text fields as lists, industry as an id into an interned list,
+    and `current_price` / `market_cap` additionally as float arrays (NaN when missing).
+    `page` is derived from the ticker and only stored when it differs.
+    Records read from the table are fresh dicts in FIELDS order; edits go through `table[t] = rec`.
+    """
+
+    FIELDS = ("name", "ticker", "industry", "market_cap", "last_updated",
+              "current_price", "target_price", "page", "rating", "strategy")
+    TEXT_FIELDS = ("name", "market_cap", "last_updated", "current_price", "target_price", "rating", "strategy")
+    _CAP_RE = re.compile(r"^\$?\s*(\d*\.?\d+)\s*([KMBT]?)$", re.IGNORECASE)
+    _CAP_MULT = {"": 1.0, "K": 1e3, "M": 1e6, "B": 1e9, "T": 1e12}
+
+    def __init__(self):
+        self.tickers: List[str] = []
+        self.columns: Dict[str, List[str]] = {f: [] for f in self.TEXT_FIELDS}
+        self.industries: List[str] = []
+        self.industry_id = array("i")
+        self.price = array("d")
+        self.market_cap_value = array("d")
+        self._industry_lookup: Dict[str, int] = {}
+        self._extra: Dict[int, Dict] = {}  # row -> non-standard fields (incl. a non-derived page)
+        self._index: Dict[str, int] = {}
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "StockTable":
+        table = cls()
+        for rec in records:
+            tkr = (rec.get("ticker") or "").upper()
+            table[tkr] = rec
+        return table
+
+    # ---- mapping protocol ----
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.tickers)
+
+    def __contains__(self, ticker) -> bool:
+        return ticker in self._index
+
+    def __getitem__(self, ticker: str) -> Dict:
+        return self.record(self._index[ticker])
+
+    def __setitem__(self, ticker: str, rec: Dict) -> None:
+        self.set_row(ticker, **{f: rec.get(f) for f in self.TEXT_FIELDS},
+                     industry=rec.get("industry"), extra=self._extras_of(ticker, rec))
+
+    def __delitem__(self, ticker: str) -> None:
+        row = self._index.pop(ticker)
+        last = len(self.tickers) - 1
+        if row != last:
+            moved = self.tickers[last]
+            self._copy_within(last, row)
+            self._index[moved] = row
+        self.tickers.pop()
+        for col in self.columns.values():
+            col.pop()
+        self.industry_id.pop()
+        self.price.pop()
+        self.market_cap_value.pop()
+        self._extra.pop(last, None)
+
+    def clear(self) -> None:
+        self.__init__()
+
+    # ---- row access ----
+
+    def row_of(self, ticker: str) -> Optional[int]:
+        return self._index.get(ticker)
+
+    def record(self, row: int) -> Dict:
+        tkr = self.tickers[row]
+        cols = self.columns
+        rec = {
+            "name": cols["name"][row],
+            "ticker": tkr,
+            "industry": self.industries[self.industry_id[row]],
+            "market_cap": cols["market_cap"][row],
+            "last_updated": cols["last_updated"][row],
+            "current_price": cols["current_price"][row],
+            "target_price": cols["target_price"][row],
+            "page": self.page_for(tkr),
+            "rating": cols["rating"][row],
+            "strategy": cols["strategy"][row],
+        }
+        extra = self._extra.get(row)
+        if extra:
+            rec.update(extra)
+        return rec
+
+    def industry_of(self, row: int) -> str:
+        return self.industries[self.industry_id[row]]
+
+    def get_field(self, ticker: str, field: str) -> str:
+        row = self._index[ticker]
+        if field in self.columns:
+            return self.columns[field][row]
+        if field == "industry":
+            return self.industry_of(row)
+        if field == "ticker":
+            return ticker
+        extra = self._extra.get(row) or {}
+        if field == "page":
+            return extra.get("page", self.page_for(ticker))
+        return extra.get(field, "")
+
+    def set_field(self, ticker: str, field: str, value) -> None:
+        """Set one field in place, creating an empty row for an unknown ticker."""
+        row = self._index.get(ticker)
+        if row is None:
+            row = self.set_row(ticker)
+        if field in self.columns:
+            value = "" if value is None else str(value)
+            self.columns[field][row] = value
+            if field == "current_price":
+                self.price[row] = self._to_float(value)
+            elif field == "market_cap":
+                self.market_cap_value[row] = self.parse_market_cap(value)
+        elif field == "industry":
+            self.industry_id[row] = self._intern_industry(value)
+        elif field != "ticker":
+            extra = self._extras_of(ticker, {field: value})
+            if extra:
+                self._extra.setdefault(row, {}).update(extra)
+            elif field == "page" and row in self._extra:
+                self._extra[row].pop("page", None)
+                if not self._extra[row]:
+                    del self._extra[row]
+
+    def set_row(self, ticker: str, name=None, market_cap=None, last_updated=None, current_price=None,
+                target_price=None, rating=None, strategy=None, industry=None,
+                extra: Optional[Dict] = None) -> int:
+        """Insert or overwrite a whole row without building a dict; None is stored as ""."""
+        values = (name, market_cap, last_updated, current_price, target_price, rating, strategy)
+        values = tuple("" if v is None else (v if isinstance(v, str) else str(v)) for v in values)
+        ind = self._intern_industry(industry)
+        price = self._to_float(values[3])
+        cap = self.parse_market_cap(values[1])
+        row = self._index.get(ticker)
+        if row is None:
+            row = len(self.tickers)
+            self._index[ticker] = row
+            self.tickers.append(ticker)
+            for f, v in zip(self.TEXT_FIELDS, values):
+                self.columns[f].append(v)
+            self.industry_id.append(ind)
+            self.price.append(price)
+            self.market_cap_value.append(cap)
+        else:
+            for f, v in zip(self.TEXT_FIELDS, values):
+                self.columns[f][row] = v
+            self.industry_id[row] = ind
+            self.price[row] = price
+            self.market_cap_value[row] = cap
+        if extra:
+            self._extra[row] = extra
+        else:
+            self._extra.pop(row, None)
+        return row
+
+    def copy_row_from(self, other: "StockTable", row: int) -> int:
+        tkr = other.tickers[row]
+        cols = other.columns
+        return self.set_row(tkr, **{f: cols[f][row] for f in self.TEXT_FIELDS},
+                            industry=other.industry_of(row), extra=dict(other._extra.get(row) or {}))
+
+    def assign(self, other: "StockTable") -> None:
+        """Replace this table's contents with `other`'s (keeps this object's identity)."""
+        self.__dict__.update(other.__dict__)
+
+    def sorted_rows(self) -> List[int]:
+        return sorted(range(len(self.tickers)), key=self.tickers.__getitem__)
+
+    def to_records(self) -> List[Dict]:
+        """All records as dicts, sorted by ticker (the on-disk order)."""
+        return [self.record(row) for row in self.sorted_rows()]
+
+    def diff(self, new: "StockTable") -> Dict:
+        """
+        Per-ticker change set from self to `new`:
+          {"added": [tickers], "removed": [tickers], "changed": {ticker: {field: [old, new]}}}
+        """
+        added = sorted(t for t in new.tickers if t not in self._index)
+        removed = sorted(t for t in self.tickers if t not in new._index)
+        changed: Dict[str, Dict] = {}
+        for nrow, tkr in enumerate(new.tickers):
+            orow = self._index.get(tkr)
+            if orow is None:
+                continue
+            fields = {}
+            for f in self.TEXT_FIELDS:
+                old, cur = self.columns[f][orow], new.columns[f][nrow]
+                if old != cur:
+                    fields[f] = [old, cur]
+            old, cur = self.industry_of(orow), new.industry_of(nrow)
+            if old != cur:
+                fields["industry"] = [old, cur]
+            old_extra, new_extra = self._extra.get(orow) or {}, new._extra.get(nrow) or {}
+            for k in old_extra.keys() | new_extra.keys():
+                if old_extra.get(k) != new_extra.get(k):
+                    fields[k] = [old_extra.get(k, ""), new_extra.get(k, "")]
+            if fields:
+                changed[tkr] = fields
+        return {"added": added, "removed": removed, "changed": dict(sorted(changed.items()))}
+
+    # ---- helpers ----
+
+    @staticmethod
+    def page_for(ticker: str) -> str:
+        return f"stocks/{ticker}/{ticker}.html"
+
+    @classmethod
+    def parse_market_cap(cls, s: str) -> float:
+        """'40.16B' -> 4.016e10; NaN when empty or unparseable."""
+        m = cls._CAP_RE.match(s.replace(",", "").strip()) if s else None
+        if not m:
+            return math.nan
+        return float(m.group(1)) * cls._CAP_MULT[m.group(2).upper()]
+
+    _MONEY_RE = re.compile(r"^([<>]=?|)?\s*(\d*\.?\d+)\s*([KMBT]?)")
+
+    @classmethod
+    def parse_money(cls, s: str) -> float:
+        """Same rule as parseMoney() in script.js; NaN when unparseable."""
+        if not s:
+            return math.nan
+        m = cls._MONEY_RE.match(str(s).strip().replace("$", "").replace(",", "").upper())
+        if not m:
+            return math.nan
+        return float(m.group(2)) * cls._CAP_MULT[m.group(3) or ""]
+
+    @staticmethod
+    def _to_float(s: str) -> float:
+        try:
+            return float(s) if s else math.nan
+        except ValueError:
+            return math.nan
+
+    def _intern_industry(self, industry) -> int:
+        industry = "" if industry is None else str(industry)
+        idx = self._industry_lookup.get(industry)
+        if idx is None:
+            idx = self._industry_lookup[industry] = len(self.industries)
+            self.industries.append(industry)
+        return idx
+
+    def _extras_of(self, ticker: str, rec: Dict) -> Optional[Dict]:
+        extra = {k: v for k, v in rec.items() if k not in self.FIELDS}
+        page = rec.get("page")
+        if page and page != self.page_for(ticker):
+            extra["page"] = page
+        return extra or None
+
+    def _copy_within(self, src: int, dst: int) -> None:
+        for col in self.columns.values():
+            col[dst] = col[src]
+        self.industry_id[dst] = self.industry_id[src]
+        self.price[dst] = self.price[src]
+        self.market_cap_value[dst] = self.market_cap_value[src]
+        if src in self._extra:
+            self._extra[dst] = self._extra.pop(src)
+        else:
+            self._extra.pop(dst, None)
+
+
+def _instrumented(method):
+    """Run a public StockDatasetUpdater method as one metrics operation (a phase when nested)."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.metrics.operation(method.__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class StockDatasetUpdater:
@@ -28,6 +336,17 @@ class StockDatasetUpdater:
       - `set_last_updated()` lets you manually set (or clear) `last_updated`.
       - `set_industry()` lets you manually set/override industry (does NOT change `last_updated`).
       - `upsert_ticker()` will NOT overwrite a non-empty existing `industry`; it only fills if missing.
+      - Exchanges are fetched concurrently and retried; failed ones keep their last rows (see `update_json()`).
+      - Screener payloads are streamed into per-exchange snapshots under `cache_dir` (see `_fetch_exchange()`).
+      - `batch()` / `apply_edits()` load once and write once; an exception writes nothing.
+      - `journal=True` appends edits to `<json>.journal.jsonl` instead of rewriting the JSON (see `compact()`).
+      - Loads reuse a pickle of the parsed JSON under `<json dir>/.cache/` (`load_cache=False` disables it).
+      - Every write also runs `publish()`, `write_shards()`, `write_sectors()` and `write_search_index()`
+        (`publish`, `shards`, `sectors`, `search_index` turn them off).
+      - `history=True` records each refresh's prices (see `price_history()`).
+      - `api_url` replaces the Nasdaq screener endpoint, e.g. with a local ScreenerStub (screener_stub.py).
+      - Public methods are timed into `metrics` (UpdaterMetrics); `log_json` / STOCKS_LOG_JSON and
+        `profile` / STOCKS_PROFILE add JSON logs and profiles.
     """
 
     NASDAQ_API = "https://api.nasdaq.com/api/screener/stocks"
@@ -49,38 +368,179 @@ class StockDatasetUpdater:
         include_nyse: bool = True,
         include_nasdaq: bool = True,
         include_amex: bool = True,
-        session: Optional[requests.Session] = None,
+        session: Optional["requests.Session"] = None,
         logger: Optional[logging.Logger] = None,
+        max_workers: int = 3,
+        max_retries: int = 2,
+        retry_backoff: float = 1.0,
+        timeout: float = 30,
+        cache_dir: Optional[str] = None,
+        cache_ttl: float = 900,
+        journal: bool = False,
+        load_cache: bool = True,
+        publish: bool = True,
+        shards: bool = True,
+        site_root: Optional[str] = None,
+        sectors: bool = True,
+        search_index: bool = True,
+        history: bool = True,
+        history_dir: Optional[str] = None,
+        api_url: Optional[str] = None,
+        metrics_hooks: Optional[Iterable[Callable[[Dict], None]]] = None,
+        log_json: Optional[bool] = None,
+        profile: Optional[str] = None,
+        profile_dir: Optional[str] = None,
     ):
         self.json_path = Path(json_path)
+        self.api_url = api_url or self.NASDAQ_API
         self.include = {"nyse": include_nyse, "nasdaq": include_nasdaq, "amex": include_amex}
-        self.session = session or requests.Session()
-        self.session.headers.update(self.DEFAULT_HEADERS)
+        self.max_workers = max(1, int(max_workers))
+        self.max_retries = max(0, int(max_retries))
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.cache_dir = Path(cache_dir) if cache_dir else self.json_path.parent / ".cache" / "screener"
+        self.cache_ttl = cache_ttl
+        self._snapshots: Dict[str, Tuple[float, Dict[str, Dict]]] = {}  # exch -> (fetched_at, normalized by ticker)
+        self._ticker_exchange: Optional[Dict[str, str]] = None
+        self._cache_lock = threading.Lock()
+        self._stale_exchanges: set = set()  # exchanges the last fetch served from a stale snapshot
+        self._batch: Optional[StockTable] = None  # shared table while inside batch()
+        self._batch_dirty = False
+        self._batch_full_write = False
+        self._batch_changes: Optional[Dict] = None
+        self._batch_history: Optional[set] = None  # fresh tickers of an update_json() in the batch; recorded on commit
+        self.changes_path = self.json_path.with_name(self.json_path.stem + ".changes.json")
+        self.journal = journal
+        self.journal_path = self.json_path.with_name(self.json_path.stem + ".journal.jsonl")
+        self.journal_archive_path = self.json_path.with_name(self.json_path.stem + ".journal.archive.jsonl")
+        self._pending: List[Dict] = []  # journal entries not yet appended
+        self.load_cache = load_cache
+        self.publish_enabled = publish
+        self.manifest_path = self.json_path.with_name(self.json_path.stem + ".manifest.json")
+        self.shards_enabled = shards
+        self.site_root = Path(site_root) if site_root else self.json_path.parent.parent
+        self.shards_manifest_path = self.json_path.with_name(self.json_path.stem + ".shards.json")
+        self.sectors_enabled = sectors
+        self.sectors_path = self.json_path.with_name("sectors.json")
+        self._dirty_industries: Optional[set] = set()  # None = recompute every industry
+        self._dirty_tickers: Optional[set] = set()  # None = rebuild every ticker shard
+        self.search_index_enabled = search_index
+        self.search_index_path = self.json_path.with_name(self.json_path.stem + ".search.json")
+        self._search: Optional[Tuple[Tuple[int, int], SearchIndex, StockTable]] = None
+        self._search_file_digest: Optional[str] = None
+        self.history_enabled = history
+        self.history_dir = Path(history_dir) if history_dir else self.json_path.parent / "history"
+        self.load_cache_path = self.json_path.parent / ".cache" / (self.json_path.name + ".pickle")
+        self._session = session
+        self._session_lock = threading.Lock()
+        if session is not None:
+            session.headers.update(self.DEFAULT_HEADERS)
 
         self.logger = logger or logging.getLogger("StockDatasetUpdater")
         if not self.logger.handlers:
             logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
+        if log_json is None:
+            log_json = os.environ.get("STOCKS_LOG_JSON", "").lower() in ("1", "true", "yes")
+        self.metrics = UpdaterMetrics(
+            hooks=metrics_hooks,
+            log_json=log_json,
+            profile=profile if profile is not None else os.environ.get("STOCKS_PROFILE"),
+            profile_dir=profile_dir or str(self.json_path.parent / ".cache" / "profiles"),
+            logger=self.logger,
+        )
+
+    @property
+    def session(self) -> "requests.Session":
+        """HTTP session, created on first use so offline edits never import `requests`."""
+        with self._session_lock:
+            if self._session is None:
+                import requests
+
+                self._session = requests.Session()
+                self._session.headers.update(self.DEFAULT_HEADERS)
+            return self._session
+
     # ---------------- Public API ----------------
 
-    def update_json(self) -> None:
-        """Refresh ALL tickers; do NOT modify last_updated."""
-        existing = self._load_existing()
-        universe = self._fetch_universe()
-        merged = self._merge_refresh_all(existing, universe)  # preserves last_updated
-        merged = [self._ensure_rating_strategy(rec) for rec in merged]
-        self._write_json(merged)
-        self.logger.info("Wrote %d records to %s", len(merged), self.json_path)
-
-    def _ensure_rating_strategy(self, rec: Dict) -> Dict:
-        """Guarantee rating/strategy keys exist (empty string when missing/None)."""
-        r = rec.copy()
-        if r.get("rating") is None or "rating" not in r:
-            r["rating"] = ""
-        if r.get("strategy") is None or "strategy" not in r:
-            r["strategy"] = ""
-        return r
+    @_instrumented
+    def update_json(self) -> Dict:
+        """
+        Refresh ALL tickers; do NOT modify last_updated.
+        Exchanges are fetched concurrently (`max_workers`). Tickers of exchanges that still fail after
+        retries keep their last known rows; if ALL fail, this raises and leaves the file alone.
+        Returns the change set (see `StockTable.diff`). When nothing changed the JSON is not
+        rewritten (a pending journal is still compacted); otherwise the change set is also
+        written to `<json>.changes.json` with the content hash of the new file. Every shard and
+        sector is rebuilt.
+        """
+        table = self._load_table()
+        universe, failed, fresh = self._fetch_universe()
+        with self.metrics.phase("merge") as phase:
+            merged = self._merge_refresh_all(table, universe)  # preserves last_updated
+            if failed:
+                self._keep_unrefreshed(table, merged)
+                self.logger.warning("Kept last known rows for failed exchange(s): %s", ", ".join(failed))
+            phase["rows"] = len(merged)
+        with self.metrics.phase("diff") as phase:
+            changes = table.diff(merged)
+            table.assign(merged)
+            phase["rows"] = len(changes["added"]) + len(changes["removed"]) + len(changes["changed"])
+        self._dirty_industries = None
+        self._dirty_tickers = None
+        if self.history_enabled:
+            if self._batch is not None:
+                self._batch_history = fresh  # recorded on commit, so a rollback leaves no prices behind
+            else:
+                self._record_history(table, fresh)
+        if not self._has_changes(changes):
+            self.logger.info("Refresh found no changes (%d records)", len(table))
+            if self.journal_path.exists() and self._batch is None:
+                self.compact()
+            return changes
+        if self._batch is not None:
+            self._batch_changes = changes
+        digest = self._save_table(table, full=True)
+        if digest is not None:
+            self._write_changes(changes, digest)
+        self.logger.info("Refreshed %d records (%d added, %d removed, %d changed) -> %s",
+                         len(table), len(changes["added"]), len(changes["removed"]),
+                         len(changes["changed"]), self.json_path)
+        return changes
+
+    @_instrumented
+    def table(self) -> StockTable:
+        """The current dataset (the JSON plus any journal); the shared table inside `batch()`."""
+        return self._load_table()
+
+    def price_history(self) -> PriceHistory:
+        """
+        The on-disk price history under `history_dir` (default `<json dir>/history`). Each
+        `update_json()` records today's price and market cap per ticker, NaN for rows that were not
+        freshly downloaded; inside `batch()` only when the batch commits.
+        """
+        return PriceHistory(str(self.history_dir))
+
+    def _record_history(self, table: StockTable, fresh: set) -> None:
+        """Record today's prices; tickers outside `fresh` (kept or stale rows) get NaN."""
+        with self.metrics.phase("history") as phase:
+            rows = self.price_history().append(self._today(), table, fresh=fresh)
+            phase["rows"] = rows
+        self.logger.info("Recorded %d prices for %s in %s", rows, self._today(), self.history_dir)
+
+    @_instrumented
+    def return_since_last_updated(self, ticker: str) -> Optional[float]:
+        """Price return (0.1 = +10%) from the ticker's `last_updated` date to the latest recorded price."""
+        ticker = ticker.strip().upper()
+        table = self._load_table()
+        if ticker not in table:
+            return None
+        since = table.get_field(ticker, "last_updated")
+        if not since:
+            return None
+        return self.price_history().return_since(ticker, since)
 
+    @_instrumented
     def upsert_ticker(self, ticker: str, *, target_price: Optional[str] = None,
                       strategy: Optional[str] = None, rating: Optional[str] = None) -> None:
         """
@@ -89,8 +549,7 @@ class StockDatasetUpdater:
         - existing non-empty fields are preserved (as before).
         """
         ticker = ticker.strip().upper()
-        existing = self._load_existing()
-        ex_by_ticker = {(e.get("ticker") or "").upper(): e for e in existing}
+        ex_by_ticker = self._load_table()
 
         fresh = self._fetch_single_from_screener(ticker)
         if not fresh:
@@ -121,18 +580,17 @@ class StockDatasetUpdater:
             "page": f"stocks/{ticker}/{ticker}.html",
         }
 
-        ex_by_ticker[ticker] = merged
-        out = [self._ensure_rating_strategy(ex_by_ticker[t]) for t in sorted(ex_by_ticker.keys())]
-        self._write_json(out)
-        self.logger.info("Upserted %s (last_updated unchanged) -> %s", ticker, self.json_path)
+        self._put_record(ex_by_ticker, merged)  # the table stores missing rating/strategy as ""
+        self._save_table(ex_by_ticker)
+        self._log_edit("Upserted %s (last_updated unchanged) -> %s", ticker, self.json_path)
 
+    @_instrumented
     def set_target_price(self, ticker: str, target_price: str) -> None:
         """
         Update ONLY the target price of a ticker and bump last_updated (today).
         """
         ticker = ticker.strip().upper()
-        data = self._load_existing()
-        by_ticker = {(e.get("ticker") or "").upper(): e for e in data}
+        by_ticker = self._load_table()
 
         rec = by_ticker.get(ticker)
         if not rec:
@@ -153,21 +611,21 @@ class StockDatasetUpdater:
             rec["last_updated"] = self._today()
 
         rec["page"] = f"stocks/{ticker}/{ticker}.html"
-        by_ticker[ticker] = rec
+        self._put_record(by_ticker, rec)
 
-        out = [by_ticker[t] for t in sorted(by_ticker.keys())]
-        self._write_json(out)
-        self.logger.info("Set target price for %s (last_updated set) -> %s", ticker, self.json_path)
+        self._save_table(by_ticker)
+        self._log_edit("Set target price for %s (last_updated set) -> %s", ticker, self.json_path)
         
+    @_instrumented
     def set_strategy(self, ticker: str, strategy: str) -> None:
         """Update ONLY the strategy and bump last_updated (today)."""
         self._set_field_and_bump(ticker, field="strategy", value=str(strategy))  # NEW
 
+    @_instrumented
     def set_rating(self, ticker: str, rating: str) -> None:
         """Set/override rating; does NOT change last_updated."""
         ticker = ticker.strip().upper()
-        data = self._load_existing()
-        by_ticker = {(e.get("ticker") or "").upper(): e for e in data}
+        by_ticker = self._load_table()
         rec = by_ticker.get(ticker, {
             "name": "", "ticker": ticker, "industry": "", "market_cap": "",
             "last_updated": self._today(), "current_price": "", "target_price": "",
@@ -175,11 +633,11 @@ class StockDatasetUpdater:
         }).copy()
         rec["rating"] = str(rating)
         rec["page"] = f"stocks/{ticker}/{ticker}.html"
-        by_ticker[ticker] = rec
-        out = [by_ticker[t] for t in sorted(by_ticker.keys())]
-        self._write_json(out)
-        self.logger.info("Set rating for %s -> %s", ticker, rating or "(empty)")
+        self._put_record(by_ticker, rec)
+        self._save_table(by_ticker)
+        self._log_edit("Set rating for %s -> %s", ticker, rating or "(empty)")
 
+    @_instrumented
     def set_last_updated(self, ticker: str, date: Optional[str] = None) -> None:
         """
         Manually set (or clear) last_updated for a ticker.
@@ -188,8 +646,7 @@ class StockDatasetUpdater:
         - else must be 'YYYY-MM-DD'
         """
         ticker = ticker.strip().upper()
-        data = self._load_existing()
-        by_ticker = {(e.get("ticker") or "").upper(): e for e in data}
+        by_ticker = self._load_table()
 
         rec = by_ticker.get(ticker, {
             "name": "",
@@ -211,12 +668,12 @@ class StockDatasetUpdater:
             rec["last_updated"] = date
 
         rec["page"] = f"stocks/{ticker}/{ticker}.html"
-        by_ticker[ticker] = rec
+        self._put_record(by_ticker, rec)
 
-        out = [by_ticker[t] for t in sorted(by_ticker.keys())]
-        self._write_json(out)
-        self.logger.info("Set last_updated for %s -> %s", ticker, rec["last_updated"])
+        self._save_table(by_ticker)
+        self._log_edit("Set last_updated for %s -> %s", ticker, rec["last_updated"])
 
+    @_instrumented
     def set_industry(self, ticker: str, industry: str) -> None:
         """
         Manually set/override the `industry` field for a ticker.
@@ -224,8 +681,7 @@ class StockDatasetUpdater:
         """
         ticker = ticker.strip().upper()
         industry = (industry or "").strip()
-        data = self._load_existing()
-        by_ticker = {(e.get("ticker") or "").upper(): e for e in data}
+        by_ticker = self._load_table()
 
         rec = by_ticker.get(ticker, {
             "name": "",
@@ -240,18 +696,426 @@ class StockDatasetUpdater:
 
         rec["industry"] = industry
         rec["page"] = f"stocks/{ticker}/{ticker}.html"
-        by_ticker[ticker] = rec
+        self._put_record(by_ticker, rec)
 
-        out = [by_ticker[t] for t in sorted(by_ticker.keys())]
-        self._write_json(out)
-        self.logger.info("Set industry for %s -> %s", ticker, industry or "(empty)")
+        self._save_table(by_ticker)
+        self._log_edit("Set industry for %s -> %s", ticker, industry or "(empty)")
+
+    @contextmanager
+    def batch(self) -> Iterator["StockDatasetUpdater"]:
+        """
+        Group many edits into one load and one write:
+
+            with updater.batch():
+                updater.set_target_price("AAPL", "250")
+                updater.set_rating("AAPL", "Buy")
+
+        Every mutator inside edits the same in-memory table. Nested batches join the outer one.
+        On exception nothing is written.
+        """
+        if self._batch is not None:
+            yield self
+            return
+        with self.metrics.operation("batch"):
+            yield from self._run_batch()
+
+    def _run_batch(self) -> Iterator["StockDatasetUpdater"]:
+        self._batch = self._read_table()
+        self._batch_dirty = False
+        self._batch_full_write = False
+        self._batch_history = None
+        try:
+            yield self
+        except BaseException:
+            self._pending.clear()
+            self._dirty_industries = set()
+            self._dirty_tickers = set()
+            self.logger.warning("Batch rolled back; %s left unchanged.", self.json_path)
+            raise
+        else:
+            table = self._batch
+            self._batch = None
+            if self._batch_dirty:
+                digest = self._save_table(table, full=self._batch_full_write, fast_publish=False)
+                if digest is not None and self._batch_changes is not None:
+                    self._write_changes(self._batch_changes, digest)
+                self.logger.info("Committed batch (%d records) -> %s", len(table), self.json_path)
+            if self._batch_history is not None:
+                self._record_history(table, self._batch_history)
+        finally:
+            self._batch = None
+            self._batch_dirty = False
+            self._batch_full_write = False
+            self._batch_changes = None
+            self._batch_history = None
+
+    @_instrumented
+    def compact(self) -> None:
+        """
+        Fold the edit journal into the JSON file and move its entries to the archive.
+        With `journal=True`, edits append one {"ts", "by", "ticker", "field", "value"} line per changed
+        field to `<json>.journal.jsonl` and loads replay it over the JSON. `update_json()` and every
+        full write fold it in too; `<json>.journal.archive.jsonl` keeps the whole edit history.
+        """
+        if not self.journal_path.exists():
+            return
+        table = self._read_table()
+        self._write_json(table)
+        self.logger.info("Compacted journal into %s (%d records)", self.json_path, len(table))
+
+    # (gzip level, brotli quality) for publish(): full writes vs. single edits
+    PUBLISH_LEVELS = {"best": (9, 9), "fast": (1, 4)}
+
+    @_instrumented
+    def publish(self, table: Optional[StockTable] = None, fast: bool = False) -> Dict:
+        """
+        Write the browser-facing artifacts next to the JSON and return the manifest:
+          <stem>.<hash>.min.json (+ .gz, + .br when brotli is installed) and
+          <stem>.manifest.json = {"version", "file", "bytes", "gzip_bytes", "br_bytes",
+          "compression", "generated_at"}.
+        The hashed file is immutable, so pages may cache it indefinitely and only re-read the manifest;
+        its compressed siblings sit next to it for servers that send precompressed files.
+        Hashed files (and their siblings) older than the previous version are removed.
+        `fast=True` (single set_*/upsert writes) compresses at PUBLISH_LEVELS["fast"]; the next
+        refresh, compaction or batch commit recompresses at "best" even if the data is unchanged.
+        Nothing is rewritten when the version matches and every artifact is still on disk.
+        """
+        table = table if table is not None else self._load_table()
+        data = json.dumps(table.to_records(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        version = hashlib.sha256(data).hexdigest()[:16]
+        stem, folder = self.json_path.stem, self.json_path.parent
+        compression = "fast" if fast else "best"
+        hashed_name = f"{stem}.{version}.min.json"
+        hashed_path = folder / hashed_name
+        gz_path = hashed_path.with_name(hashed_name + ".gz")
+        br_path = hashed_path.with_name(hashed_name + ".br")
+
+        previous = {}
+        try:
+            with self.manifest_path.open("r", encoding="utf-8") as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            pass
+        artifacts = [hashed_path, gz_path] + ([br_path] if brotli is not None else [])
+        if (previous.get("version") == version and previous.get("file") == hashed_name
+                and (fast or previous.get("compression", "best") == "best")
+                and all(p.is_file() for p in artifacts)):
+            return previous
+
+        gzip_level, brotli_quality = self.PUBLISH_LEVELS[compression]
+        gz = gzip.compress(data, compresslevel=gzip_level, mtime=0)
+        self._write_atomic(hashed_path, data)
+        self._write_atomic(gz_path, gz)
+        br_bytes = None
+        if brotli is not None:
+            br = brotli.compress(data, quality=brotli_quality)
+            self._write_atomic(br_path, br)
+            br_bytes = len(br)
+
+        manifest = {
+            "version": version,
+            "file": hashed_name,
+            "bytes": len(data),
+            "gzip_bytes": len(gz),
+            "br_bytes": br_bytes,
+            "compression": compression,
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        manifest_data = json.dumps(manifest, indent=2).encode("utf-8")
+        self._write_atomic(self.manifest_path, manifest_data)
+        self.metrics.add("publish", bytes_written=len(data) + len(gz) + (br_bytes or 0) + len(manifest_data))
+
+        keep = {hashed_name, previous.get("file")}  # the previous version stays for pages mid-load
+        for old in folder.glob(f"{stem}.*.min.json*"):
+            if old.name.split(".min.json")[0] + ".min.json" not in keep:
+                old.unlink()
+        for suffix in ("", ".gz", ".br"):  # unhashed copy written by earlier versions
+            (folder / f"{stem}.min.json{suffix}").unlink(missing_ok=True)
+        self.logger.info("Published %s (%d bytes, %d gzipped)", hashed_name, len(data), len(gz))
+        return manifest
+
+    @_instrumented
+    def write_shards(self, table: Optional[StockTable] = None, tickers: Optional[Iterable[str]] = None,
+                     industries: Optional[Iterable[str]] = None) -> Dict:
+        """
+        Write industry and ticker shards under `site_root` (default: the JSON's parent's parent)
+        and return the shard manifest `<stem>.shards.json`. The shards are `sectors/<slug>.json`
+        per industry (slug rule = slugifyIndustry in script.js) and `stocks/<T>/<T>.json` per
+        ticker, next to its page:
+          {"generated_at", "industries": {slug: {"industries", "path", "count", "bytes", "sha256"}},
+           "tickers": {ticker: {"path", "bytes", "sha256"}}}
+        A shard is rewritten only when its hash differs from the previous manifest (or the file
+        is missing); shards that disappeared from the dataset are deleted.
+        `tickers` and `industries` (raw industry values) limit the pass to those shards when a
+        manifest already exists; with neither given every shard is rebuilt.
+        """
+        table = table if table is not None else self._load_table()
+        previous: Dict = {}
+        try:
+            with self.shards_manifest_path.open("r", encoding="utf-8") as f:
+                previous = json.load(f)
+        except (OSError, ValueError):
+            pass
+        partial = (tickers is not None or industries is not None) and bool(previous.get("tickers"))
+
+        written = removed = 0
+
+        def put(kind: str, key: str, rel: str, payload, entry: Dict) -> None:
+            nonlocal written, removed
+            data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()[:16]
+            old = previous.get(kind, {}).get(key) or {}
+            path = self.site_root / rel
+            if old.get("sha256") != digest or old.get("path") != rel or not path.is_file():
+                self._write_atomic(path, data)
+                self.metrics.add("write_shards", rows=1, bytes_written=len(data))
+                written += 1
+            if old.get("path") and old["path"] != rel:
+                removed += drop(old)
+            entry.update(path=rel, bytes=len(data), sha256=digest)
+            manifest[kind][key] = entry
+
+        def drop(entry: Dict) -> int:
+            stale = self.site_root / entry["path"]
+            if stale.is_file():
+                stale.unlink()
+                return 1
+            return 0
+
+        manifest: Dict = {"generated_at": datetime.now().isoformat(timespec="seconds"),
+                          "industries": {}, "tickers": {}}
+        if partial:
+            manifest["industries"] = dict(previous.get("industries") or {})
+            manifest["tickers"] = dict(previous["tickers"])
+            for tkr in set(tickers or ()):
+                row = table.row_of(tkr)
+                if row is not None:
+                    rec = table.record(row)
+                    put("tickers", tkr, str(Path(rec["page"]).with_suffix(".json")), rec, {})
+                elif tkr in manifest["tickers"]:
+                    removed += drop(manifest["tickers"].pop(tkr))
+            slugs = {self.slugify_industry(ind) for ind in (industries or ())}
+        else:
+            slugs = None
+
+        # industry shards: every industry on a full pass, else only the dirty slugs
+        slug_of = [self.slugify_industry(ind) for ind in table.industries]
+        groups: Dict[str, List[int]] = {}
+        names: Dict[str, set] = {}
+        for row in table.sorted_rows():
+            slug = slug_of[table.industry_id[row]]
+            if slugs is not None and slug not in slugs:
+                continue
+            groups.setdefault(slug, []).append(row)
+            names.setdefault(slug, set()).add(table.industry_of(row))
+            if not partial:
+                rec = table.record(row)
+                put("tickers", rec["ticker"], str(Path(rec["page"]).with_suffix(".json")), rec, {})
+        for slug, rows in groups.items():
+            put("industries", slug, f"sectors/{slug}.json", [table.record(r) for r in rows],
+                {"industries": sorted(names[slug]), "count": len(rows)})
+
+        if partial:
+            for slug in slugs - set(groups):
+                if slug in manifest["industries"]:
+                    removed += drop(manifest["industries"].pop(slug))
+        else:
+            for kind in ("industries", "tickers"):
+                for key, entry in (previous.get(kind) or {}).items():
+                    if key not in manifest[kind] and entry.get("path"):
+                        removed += drop(entry)
+
+        if written or removed or not partial:
+            self._write_atomic(self.shards_manifest_path,
+                               json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        if written or removed:
+            self.logger.info("Shards: %d written, %d removed (%d industries, %d tickers)",
+                             written, removed, len(manifest["industries"]), len(manifest["tickers"]))
+        return manifest
+
+    @_instrumented
+    def write_sectors(self, table: Optional[StockTable] = None, only: Optional[Iterable[str]] = None) -> List[Dict]:
+        """
+        Write `sectors.json` and return its rows (one per industry, sorted by name):
+          {"industry", "count", "covered", "coverage_pct", "mktcap_total",
+           "cur_median", "tgt_median", "upside_pct", "page"}
+        Mirrors buildSectorRows() in script.js: only rows with last_updated are grouped, and
+        an empty industry is keyed "—". NaN medians/upside are written as null.
+        `only` limits recomputation to those raw industry values when sectors.json already exists.
+        """
+        table = table if table is not None else self._load_table()
+        by_key: Dict[str, Dict] = {}
+        keys = None
+        if only is not None:
+            keys = {self._sector_key(ind) for ind in only}
+            try:
+                with self.sectors_path.open("r", encoding="utf-8") as f:
+                    by_key = {row["industry"]: row for row in json.load(f)}
+            except (OSError, ValueError, KeyError, TypeError):
+                keys, by_key = None, {}
+
+        groups: Dict[str, List[int]] = {}
+        last_updated = table.columns["last_updated"]
+        for row in range(len(table)):
+            if not last_updated[row].strip():
+                continue
+            key = self._sector_key(table.industry_of(row))
+            if keys is None or key in keys:
+                groups.setdefault(key, []).append(row)
+
+        for key in (keys if keys is not None else set(by_key) | set(groups)):
+            if key in groups:
+                by_key[key] = self._sector_row(table, key, groups[key])
+            else:
+                by_key.pop(key, None)
+
+        out = [by_key[k] for k in sorted(by_key)]
+        data = json.dumps(out, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._write_atomic(self.sectors_path, data)
+        self.metrics.add("write_sectors", rows=len(groups), bytes_written=len(data))
+        return out
+
+    @staticmethod
+    def _sector_key(industry: str) -> str:
+        return (industry or "—").strip() or "—"
+
+    def _sector_row(self, table: StockTable, key: str, rows: List[int]) -> Dict:
+        def finite(values):
+            return [v for v in values if not math.isnan(v)]
+
+        def median(values):
+            arr = sorted(finite(values))
+            if not arr:
+                return None
+            m = len(arr) // 2
+            return arr[m] if len(arr) % 2 else (arr[m - 1] + arr[m]) / 2
+
+        covered = sum(1 for r in rows if table.columns["last_updated"][r].strip())
+        cols = table.columns
+        cur_med = median(StockTable.parse_money(cols["current_price"][r]) for r in rows)
+        tgt_med = median(StockTable.parse_money(cols["target_price"][r]) for r in rows)
+        upside = ((tgt_med - cur_med) / cur_med * 100
+                  if cur_med is not None and tgt_med is not None and cur_med > 0 else None)
+        return {
+            "industry": key,
+            "count": len(rows),
+            "covered": covered,
+            "coverage_pct": covered / len(rows) * 100 if rows else 0,
+            "mktcap_total": sum(finite(StockTable.parse_money(cols["market_cap"][r]) for r in rows)),
+            "cur_median": cur_med,
+            "tgt_median": tgt_med,
+            "upside_pct": upside,
+            "page": f"sectors/{self.slugify_industry(key)}.html",
+        }
+
+    @_instrumented
+    def write_search_index(self, table: Optional[StockTable] = None) -> Optional[SearchIndex]:
+        """
+        Write the SearchIndex for `table` to `<stem>.search.json`. Skipped (returns None) when the
+        file already indexes the same ticker/name/industry texts, e.g. after rating or target edits.
+        """
+        table = table if table is not None else self._load_table()
+        _, texts = SearchIndex._texts(table)
+        if self._search_file_digest is None:
+            self._search_file_digest = self._read_search_digest()
+        if self._search_file_digest == SearchIndex.texts_digest(texts) and self.search_index_path.exists():
+            return None
+        index = SearchIndex.build(table)
+        data = json.dumps(index.to_json(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._write_atomic(self.search_index_path, data)
+        self.metrics.add("write_search_index", rows=len(table), bytes_written=len(data))
+        self._search_file_digest = index.digest
+        return index
+
+    _SEARCH_HEAD_RE = re.compile(r'^\{"format":(\d+),"texts_sha":"([0-9a-f]+)"')
+
+    def _read_search_digest(self) -> str:
+        """texts_sha of the index file if it is in the current format, else ""; reads only the head."""
+        try:
+            with self.search_index_path.open("r", encoding="utf-8") as f:
+                m = self._SEARCH_HEAD_RE.match(f.read(128))
+        except (OSError, ValueError):
+            return ""
+        return m.group(2) if m and int(m.group(1)) == SearchIndex.FORMAT else ""
+
+    def _read_search_doc(self) -> Dict:
+        try:
+            with self.search_index_path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @_instrumented
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """
+        Records whose "ticker name industry" contains `query` (case-insensitive), best first.
+        Uses `<stem>.search.json` when it indexes the current data, else builds the index in memory.
+        """
+        if self._batch is not None:
+            table, index = self._batch, SearchIndex.build(self._batch)
+        else:
+            key = self._load_cache_key() if self.json_path.exists() else None
+            if self._search is None or self._search[0] != key or self.journal_path.exists():
+                table = self._read_table()
+                try:
+                    index = SearchIndex.from_json(self._read_search_doc(), table)
+                except (ValueError, KeyError):
+                    index = SearchIndex.build(table)
+                self._search = (key, index, table)
+            _, index, table = self._search
+        rows = table.sorted_rows()
+        return [table.record(rows[i]) for i in index.search(query, limit)]
+
+    _SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+    @classmethod
+    def slugify_industry(cls, name: str) -> str:
+        """Same rule as slugifyIndustry() in script.js."""
+        s = (name or "sector").lower().replace("&", "and")
+        return cls._SLUG_RE.sub("-", s).strip("-")
+
+    EDIT_FIELDS = ("target_price", "strategy", "rating", "last_updated", "industry")
+    UPSERT = "upsert"
+
+    @_instrumented
+    def apply_edits(self, edits: Iterable[Dict]) -> int:
+        """
+        Apply many {"ticker": ..., "field": ..., "value": ...} edits in one batch.
+        `field` is one of EDIT_FIELDS and routes to the matching set_* method,
+        so the last_updated policy is the same as for single edits. `field` "upsert" runs
+        `upsert_ticker(ticker)`; upserts share the exchange snapshots the first one fetched
+        (kept for `cache_ttl`). Returns the edit count.
+        """
+        count = 0
+        with self.batch():
+            for edit in edits:
+                self.check_edit(edit)
+                if edit["field"] == self.UPSERT:
+                    self.upsert_ticker(edit["ticker"])
+                else:
+                    getattr(self, f"set_{edit['field']}")(edit["ticker"], edit.get("value", ""))
+                count += 1
+        return count
+
+    @classmethod
+    def check_edit(cls, edit: Dict) -> None:
+        """Raise ValueError if `apply_edits` would reject this edit (bad shape, field or date)."""
+        if not isinstance(edit, dict) or not str(edit.get("ticker") or "").strip():
+            raise ValueError("Each edit needs a ticker")
+        field = edit.get("field")
+        if field != cls.UPSERT and field not in cls.EDIT_FIELDS:
+            raise ValueError(f"Unsupported edit field {field!r}; "
+                             f"expected one of {cls.EDIT_FIELDS + (cls.UPSERT,)}")
+        value = edit.get("value")
+        if field == "last_updated" and value not in (None, "", "delete") and not cls._valid_date(str(value)):
+            raise ValueError(f"{edit['ticker']}: last_updated must be YYYY-MM-DD, \"\" for today "
+                             f"or \"delete\" (got {value!r})")
 
     # ---------- internal helper ----------
     def _set_field_and_bump(self, ticker: str, *, field: str, value: str) -> None:
         """Set one field and bump last_updated to today (used by target_price & strategy)."""
         ticker = ticker.strip().upper()
-        data = self._load_existing()
-        by_ticker = {(e.get("ticker") or "").upper(): e for e in data}
+        by_ticker = self._load_table()
 
         rec = by_ticker.get(ticker)
         if not rec:
@@ -269,99 +1133,391 @@ class StockDatasetUpdater:
             rec["last_updated"] = self._today()
             rec["page"] = f"stocks/{ticker}/{ticker}.html"
 
-        by_ticker[ticker] = rec
-        out = [by_ticker[t] for t in sorted(by_ticker.keys())]
-        self._write_json(out)
-        self.logger.info("Set %s for %s (last_updated set) -> %s", field, ticker, self.json_path)
-
-    def _merge_refresh_all(self, existing: List[Dict], universe: Dict[str, Dict]) -> List[Dict]:
-        """Full refresh (ALL): preserve last_updated, target_price, strategy, rating."""
-        ex_by_t = {(e.get("ticker") or "").upper(): e for e in (existing or [])}
-        updated: Dict[str, Dict] = {}
-        for tkr, fresh in universe.items():
-            prev = ex_by_t.get(tkr, {})
-            merged = {
-                "name": fresh["name"],
-                "ticker": tkr,
-                "industry": fresh["industry"],
-                "market_cap": fresh["market_cap"],
-                "last_updated": prev.get("last_updated", ""),
-                "current_price": fresh["current_price"],
-                "target_price": prev.get("target_price", ""),
-                "strategy":     prev.get("strategy", ""),    # NEW
-                "rating":       prev.get("rating", ""),      # NEW
-                "page": f"stocks/{tkr}/{tkr}.html",
-            }
-            updated[tkr] = merged
-        return [updated[t] for t in sorted(updated.keys())]
-    
+        self._put_record(by_ticker, rec)
+        self._save_table(by_ticker)
+        self._log_edit("Set %s for %s (last_updated set) -> %s", field, ticker, self.json_path)
+
     # ---------------- Fetch helpers ----------------
 
-    def _fetch_universe(self) -> Dict[str, Dict]:
-        rows: List[Dict] = []
-        for exch, use in self.include.items():
-            if not use:
-                continue
-            r = self.session.get(self.NASDAQ_API, params={"download": "true", "exchange": exch}, timeout=30)
+    def _fetch_universe(self) -> Tuple[Dict[str, Dict], List[str], set]:
+        """
+        Fetch all enabled exchanges concurrently.
+        Returns (normalized universe, names of exchanges that failed after retries, tickers whose
+        rows are current, i.e. not served from a stale snapshot after a failed download).
+        Raises if every enabled exchange failed.
+        """
+        exchanges = [exch for exch, use in self.include.items() if use]
+        if not exchanges:
+            return {}, [], set()
+
+        workers = min(self.max_workers, len(exchanges))
+        with self.metrics.phase("fetch") as phase:
+            with self._cache_lock:
+                self._stale_exchanges = set()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(self._fetch_exchange_safe, exchanges))
+
+            universe: Dict[str, Dict] = {}
+            failed: List[str] = []
+            stale: set = set()
+            for exch, snapshot in zip(exchanges, results):
+                if snapshot is None:
+                    failed.append(exch)
+                    continue
+                universe.update(snapshot)
+                if exch in self._stale_exchanges:
+                    stale.update(snapshot)
+                else:
+                    stale.difference_update(snapshot)
+            phase["rows"] = len(universe)
+
+        if len(failed) == len(exchanges):
+            raise RuntimeError(f"All exchanges failed to download: {', '.join(failed)}")
+        return universe, failed, universe.keys() - stale
+
+    def _fetch_exchange_safe(self, exch: str) -> Optional[Dict[str, Dict]]:
+        """Like `_fetch_exchange`, but logs and returns None once retries are exhausted."""
+        try:
+            return self._fetch_exchange(exch)
+        except ImportError:
+            raise
+        except Exception as e:
+            self.logger.error("Failed to download %s: %s", exch, e)
+            return None
+
+    def _fetch_exchange(self, exch: str) -> Dict[str, Dict]:
+        """
+        Ticker -> normalized row for one exchange.
+        Order: in-memory snapshot, on-disk snapshot under `cache_dir` (both within `cache_ttl`),
+        then a download revalidated with ETag/Last-Modified. Connection errors, timeouts and 5xx
+        responses are retried with exponential backoff; once retries run out the old snapshot is
+        used if there is one. Each download also updates the ticker -> exchange index that
+        single-ticker lookups use.
+        """
+        now = time.time()
+        mem = self._snapshots.get(exch)
+        if mem and now - mem[0] < self.cache_ttl:
+            self.metrics.count("snapshot_memory_hit")
+            return mem[1]
+
+        meta = self._read_snapshot_meta(exch)
+        if meta and now - meta.get("fetched_at", 0) < self.cache_ttl:
+            rows = self._read_snapshot_rows(exch)
+            if rows is not None:
+                self.metrics.count("snapshot_disk_hit")
+                return self._remember_snapshot(exch, meta["fetched_at"], rows)
+
+        attempt = 0
+        while True:
+            try:
+                return self._download_exchange(exch, meta)
+            except ImportError:
+                raise  # no HTTP client installed; no retry or snapshot can help
+            except Exception as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    rows = self._read_snapshot_rows(exch) if meta else None
+                    if rows is None:
+                        raise
+                    self.metrics.count("snapshot_stale_fallback")
+                    with self._cache_lock:
+                        self._stale_exchanges.add(exch)
+                    self.logger.warning("Download of %s failed (%s); using stale snapshot from %s",
+                                        exch, e, datetime.fromtimestamp(meta.get("fetched_at", 0)).isoformat())
+                    return self._remember_snapshot(exch, meta.get("fetched_at", 0), rows)
+                delay = self.retry_backoff * (2 ** attempt)
+                attempt += 1
+                self.metrics.count("download_retries")
+                self.logger.warning("Download of %s failed (%s); retry %d/%d in %.1fs",
+                                    exch, e, attempt, self.max_retries, delay)
+                time.sleep(delay)
+
+    @staticmethod
+    def _is_retryable(e: Exception) -> bool:
+        """Connection errors, timeouts and 5xx responses; anything else would fail the same way again."""
+        if isinstance(e, (ConnectionError, TimeoutError)):
+            return True
+        requests = sys.modules.get("requests")
+        if requests is None:
+            return False
+        exc = requests.exceptions
+        if isinstance(e, (exc.ConnectionError, exc.Timeout, exc.ChunkedEncodingError)):
+            return True
+        response = getattr(e, "response", None)
+        return isinstance(e, exc.HTTPError) and response is not None and response.status_code >= 500
+
+    def _download_exchange(self, exch: str, meta: Optional[Dict]) -> Dict[str, Dict]:
+        with self.metrics.phase(f"download:{exch}") as phase:
+            return self._stream_download(exch, meta, phase)
+
+    def _stream_download(self, exch: str, meta: Optional[Dict], phase: Dict) -> Dict[str, Dict]:
+        """
+        Download one exchange, teeing the body into its snapshot while an incremental parser
+        normalizes each row of `data.rows` as it arrives. A payload with no (or an empty)
+        `data.rows` raises, so it is retried and never replaces the previous snapshot.
+        The request is conditional only
+        when the cached snapshot parses, so a 304 can always be answered from it; should it turn
+        unusable, the snapshot and its meta are dropped and the download repeated unconditionally.
+        """
+        headers = {}
+        cached = self._read_snapshot_rows(exch) if meta else None
+        if cached is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        r = self.session.get(
+            self.api_url,
+            params={"download": "true", "exchange": exch},
+            headers=headers,
+            timeout=self.timeout,
+            stream=True,
+        )
+        try:
+            if r.status_code == 304 and cached is not None:
+                self.metrics.count("snapshot_not_modified")
+                meta = dict(meta, fetched_at=time.time())
+                self._write_atomic(self._snapshot_meta_path(exch), json.dumps(meta).encode("utf-8"))
+                self.logger.info("Screener snapshot for %s not modified", exch)
+                return self._remember_snapshot(exch, meta["fetched_at"], cached)
+            if r.status_code == 304:
+                if meta is None:
+                    raise ValueError(f"Screener answered 304 for {exch} without a cached snapshot")
+                self.logger.warning("Screener answered 304 for %s but its snapshot is unusable; refetching", exch)
+                self._snapshot_meta_path(exch).unlink(missing_ok=True)
+                self._snapshot_path(exch).unlink(missing_ok=True)
+                with self._cache_lock:
+                    self._snapshots.pop(exch, None)
+                r.close()
+                return self._stream_download(exch, None, phase)
             r.raise_for_status()
-            payload = r.json()
-            rows.extend((payload or {}).get("data", {}).get("rows", []) or [])
-        return self._normalize_rows(rows)
+
+            # tee the body into the snapshot file while parsing it, so it is never held whole in memory
+            path = self._snapshot_path(exch)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".tmp")
+            received = 0
+            try:
+                with tmp.open("wb") as f:
+                    def chunks() -> Iterator[bytes]:
+                        nonlocal received
+                        for chunk in r.iter_content(chunk_size=self.STREAM_CHUNK):
+                            f.write(chunk)
+                            received += len(chunk)
+                            yield chunk
+                    rows = self._normalize_rows(self._iter_payload_rows(chunks()))
+                if not rows:
+                    # an empty universe is a bad response, not a delisting of the whole exchange
+                    raise ValueError(f"Screener payload for {exch} has no rows")
+            except BaseException:
+                tmp.unlink(missing_ok=True)  # keep the previous snapshot (and index) for the stale fallback
+                raise
+            phase.update(rows=len(rows), bytes_read=received, bytes_written=received)
+            tmp.replace(path)
+        finally:
+            r.close()
+
+        meta = {
+            "fetched_at": time.time(),
+            "etag": r.headers.get("ETag", ""),
+            "last_modified": r.headers.get("Last-Modified", ""),
+        }
+        self._write_atomic(self._snapshot_meta_path(exch), json.dumps(meta).encode("utf-8"))
+        return self._remember_snapshot(exch, meta["fetched_at"], rows, reindex=True)
+
+    # ---------------- Screener snapshot cache ----------------
+
+    def _snapshot_path(self, exch: str) -> Path:
+        return self.cache_dir / f"{exch}.json"
+
+    def _snapshot_meta_path(self, exch: str) -> Path:
+        return self.cache_dir / f"{exch}.meta.json"
+
+    def _index_path(self) -> Path:
+        return self.cache_dir / "index.json"
+
+    def _read_snapshot_meta(self, exch: str) -> Optional[Dict]:
+        try:
+            with self._snapshot_meta_path(exch).open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read_snapshot_rows(self, exch: str) -> Optional[Dict[str, Dict]]:
+        """Stream a cached payload from disk into ticker -> normalized row."""
+        try:
+            with self._snapshot_path(exch).open("rb") as f:
+                chunks = iter(lambda: f.read(self.STREAM_CHUNK), b"")
+                rows = self._normalize_rows(self._iter_payload_rows(chunks))
+        except (OSError, ValueError):
+            return None
+        return rows or None
+
+    _ROWS_KEY_RE = re.compile(r'"rows"\s*:\s*\[')
+    _ROW_SEP_RE = re.compile(r"[\s,]*")
+    STREAM_CHUNK = 64 * 1024
+
+    @classmethod
+    def _iter_payload_rows(cls, chunks: Iterable[bytes]) -> Iterator[Dict]:
+        """
+        Incrementally yield the objects of `data.rows` from a screener payload given as byte chunks.
+        Only the current partial row is buffered. A payload without a rows array (e.g.
+        `{"data": null, ...}`) or with one cut off mid-stream raises ValueError.
+        """
+        decode = codecs.getincrementaldecoder("utf-8")().decode
+        raw_decode = json.JSONDecoder().raw_decode
+        skip = cls._ROW_SEP_RE.match
+        buf = ""
+        in_rows = False
+        for chunk in chunks:
+            buf += decode(chunk)
+            if not in_rows:
+                m = cls._ROWS_KEY_RE.search(buf)
+                if not m:
+                    buf = buf[-32:]  # the key may straddle two chunks
+                    continue
+                buf = buf[m.end():]
+                in_rows = True
+            pos = 0
+            while True:
+                pos = skip(buf, pos).end()
+                if pos >= len(buf):
+                    break
+                if buf[pos] == "]":
+                    return
+                try:
+                    row, pos_end = raw_decode(buf, pos)
+                except ValueError:
+                    break  # partial row; wait for the next chunk
+                pos = pos_end
+                if isinstance(row, dict):
+                    yield row
+            buf = buf[pos:]
+        if in_rows:
+            raise ValueError("Screener payload ended inside data.rows")
+        raise ValueError("Screener payload has no data.rows array")
+
+    def _remember_snapshot(self, exch: str, fetched_at: float, by_ticker: Dict[str, Dict],
+                           reindex: bool = False) -> Dict[str, Dict]:
+        with self._cache_lock:
+            self._snapshots[exch] = (fetched_at, by_ticker)
+            if reindex:
+                index = self._load_ticker_index()
+                for tkr, ex in list(index.items()):
+                    if ex == exch and tkr not in by_ticker:
+                        del index[tkr]
+                index.update(dict.fromkeys(by_ticker, exch))
+                self._write_atomic(self._index_path(), json.dumps(index, separators=(",", ":")).encode("utf-8"))
+        return by_ticker
+
+    def _load_ticker_index(self) -> Dict[str, str]:
+        """Ticker -> exchange, built from the most recent snapshot of each exchange."""
+        if self._ticker_exchange is None:
+            try:
+                with self._index_path().open("r", encoding="utf-8") as f:
+                    self._ticker_exchange = json.load(f)
+            except (OSError, ValueError):
+                self._ticker_exchange = {}
+        return self._ticker_exchange
 
     def _fetch_single_from_screener(self, ticker: str) -> Optional[Dict]:
         ticker = ticker.upper()
-        for exch, use in self.include.items():
-            if not use:
-                continue
-            r = self.session.get(self.NASDAQ_API, params={"download": "true", "exchange": exch}, timeout=30)
+        enabled = [exch for exch, use in self.include.items() if use]
+        with self._cache_lock:
+            known = self._load_ticker_index().get(ticker)
+        if known in enabled:
+            enabled.remove(known)
+            enabled.insert(0, known)
+        for exch in enabled:
             try:
-                r.raise_for_status()
-                payload = r.json()
-            except Exception:
+                row = self._fetch_exchange(exch).get(ticker)
+            except ImportError:
+                raise
+            except Exception as e:
+                self.logger.error("Failed to download %s: %s", exch, e)
                 continue
-            rows = (payload or {}).get("data", {}).get("rows", []) or []
-            for row in rows:
-                if (row.get("symbol") or "").strip().upper() == ticker:
-                    return self._normalize_row(row)
+            if row is not None:
+                return dict(row)
         return None
 
     # ---------------- Merge logic ----------------
 
-    def _merge_refresh_all(self, existing: List[Dict], universe: Dict[str, Dict]) -> List[Dict]:
+    def _merge_refresh_all(self, existing: StockTable, universe: Dict[str, Dict]) -> StockTable:
         """
-        Full refresh (ALL): preserve last_updated & target_price.
+        Full refresh (ALL): preserve last_updated, target_price, strategy & rating.
         (Industry is refreshed from feed here; if you also want to preserve industry during full refresh,
          change the assignment below similar to upsert_ticker.)
         """
-        ex_by_t = {(e.get("ticker") or "").upper(): e for e in (existing or [])}
-        updated: Dict[str, Dict] = {}
-
+        cols = existing.columns
+        merged = StockTable()
         for tkr, fresh in universe.items():
-            prev = ex_by_t.get(tkr, {})
-            merged = {
-                "name": fresh["name"],
-                "ticker": tkr,
-                "industry": fresh["industry"],   # <- full refresh uses feed value
-                "market_cap": fresh["market_cap"],
-                "last_updated": prev.get("last_updated", ""),  # preserved (manual)
-                "current_price": fresh["current_price"],
-                "target_price": prev.get("target_price", ""),
-                "page": f"stocks/{tkr}/{tkr}.html",
-            }
-            updated[tkr] = merged
+            row = existing.row_of(tkr)
+            if row is None:
+                merged.set_row(tkr, name=fresh["name"], industry=fresh["industry"],  # <- feed value
+                               market_cap=fresh["market_cap"], current_price=fresh["current_price"])
+            else:
+                merged.set_row(
+                    tkr,
+                    name=fresh["name"],
+                    industry=fresh["industry"],
+                    market_cap=fresh["market_cap"],
+                    last_updated=cols["last_updated"][row],  # preserved (manual)
+                    current_price=fresh["current_price"],
+                    target_price=cols["target_price"][row],
+                    strategy=cols["strategy"][row],
+                    rating=cols["rating"][row],
+                )
+        return merged
 
-        return [updated[t] for t in sorted(updated.keys())]
+    @staticmethod
+    def _keep_unrefreshed(existing: StockTable, merged: StockTable) -> None:
+        """After a partial fetch, carry over existing rows the successful exchanges did not return."""
+        for row, tkr in enumerate(existing.tickers):
+            if tkr and tkr not in merged:
+                merged.copy_row_from(existing, row)
 
     # ---------------- Normalization ----------------
 
-    def _normalize_rows(self, rows: List[Dict]) -> Dict[str, Dict]:
+    NORMALIZE_BATCH = 4096
+
+    def _normalize_rows(self, rows: Iterable[Dict]) -> Dict[str, Dict]:
+        """
+        Normalize rows as they are consumed (works on a stream), NORMALIZE_BATCH rows at a time
+        via `_normalize_batch`; last row per ticker wins.
+        """
         out: Dict[str, Dict] = {}
+        batch: List[Dict] = []
         for row in rows:
-            norm = self._normalize_row(row)
-            if norm:
-                out[norm["ticker"]] = norm
+            batch.append(row)
+            if len(batch) >= self.NORMALIZE_BATCH:
+                self._normalize_batch(batch, out)
+                batch = []
+        if batch:
+            self._normalize_batch(batch, out)
         return out
 
+    def _normalize_batch(self, rows: List[Dict], out: Dict[str, Dict]) -> None:
+        """Column-at-a-time equivalent of `_normalize_row` over a batch; writes into `out`."""
+        with self.metrics.phase("normalize") as phase:
+            phase["rows"] = len(rows)
+            self._normalize_columns(rows, out)
+
+    def _normalize_columns(self, rows: List[Dict], out: Dict[str, Dict]) -> None:
+        tickers = [(r.get("symbol") or "").strip().upper() for r in rows]
+        names = [(r.get("name") or "").strip() for r in rows]
+        industries = [(r.get("industry") or r.get("sector") or "").strip() for r in rows]
+        caps = self._fmt_market_caps([(r.get("marketCap") or "").replace(",", "").strip() for r in rows])
+        prices = self._parse_prices([r.get("lastsale", "") for r in rows])
+        for ticker, name, industry, cap, price in zip(tickers, names, industries, caps, prices):
+            if ticker:
+                out[ticker] = {
+                    "name": name,
+                    "ticker": ticker,
+                    "industry": industry,
+                    "market_cap": cap,
+                    "current_price": price,
+                }
+
     def _normalize_row(self, row: Dict) -> Optional[Dict]:
         ticker = (row.get("symbol") or "").strip().upper()
         if not ticker:
@@ -381,25 +1537,226 @@ class StockDatasetUpdater:
             "industry": industry,
             "market_cap": market_cap_pretty,
             "current_price": current_price,
-            "page": f"stocks/{ticker}/{ticker}.html",
         }
 
     # ---------------- File I/O ----------------
 
+    def _load_table(self) -> StockTable:
+        """Ticker -> record table; the shared batch table when inside `batch()`."""
+        if self._batch is not None:
+            return self._batch
+        return self._read_table()
+
+    def _log_edit(self, msg: str, *args) -> None:
+        """Log a single edit at INFO, or at DEBUG inside `batch()`, which logs its commit once."""
+        self.logger.log(logging.DEBUG if self._batch is not None else logging.INFO, msg, *args)
+
+    def _put_record(self, by_ticker: StockTable, rec: Dict) -> None:
+        """Store one edited record, queueing a journal entry per changed field in journal mode."""
+        ticker = rec["ticker"]
+        self._mark_dirty(by_ticker, ticker, rec.get("industry") or "")
+        if self.journal:
+            prev = by_ticker.get(ticker) or {}
+            ts = datetime.now().isoformat(timespec="seconds")
+            user = self._journal_user()
+            for field, value in rec.items():
+                if field not in prev or prev[field] != value:
+                    self._pending.append({"ts": ts, "by": user, "ticker": ticker, "field": field, "value": value})
+        by_ticker[ticker] = rec
+
+    def _mark_dirty(self, table: StockTable, ticker: str, industry: str) -> None:
+        """Record that `ticker` is about to change (ending up in `industry`) for partial derived writes."""
+        if self._dirty_tickers is not None:
+            self._dirty_tickers.add(ticker)
+        if self._dirty_industries is not None:
+            if ticker in table:
+                self._dirty_industries.add(table.get_field(ticker, "industry"))
+            self._dirty_industries.add(industry)
+
+    def _save_table(self, by_ticker: StockTable, full: bool = False, fast_publish: bool = True) -> Optional[str]:
+        """
+        Persist the table, or defer to the end of the current batch.
+        In journal mode partial edits are appended to the journal; `full=True` rewrites the JSON.
+        Partial writes publish with fast compression unless `fast_publish=False` (batch commits).
+        Returns the JSON's content hash when it was (re)written, else None.
+        """
+        if self._batch is not None:
+            self._batch_dirty = True
+            self._batch_full_write = self._batch_full_write or full
+            return None
+        digest = None
+        if self.journal and not full:
+            self._append_journal(self._pending)
+        else:
+            digest = self._write_json(by_ticker, fast_publish=fast_publish and not full)
+        self._pending.clear()
+        return digest
+
+    @staticmethod
+    def _has_changes(changes: Dict) -> bool:
+        return bool(changes["added"] or changes["removed"] or changes["changed"])
+
+    def _write_changes(self, changes: Dict, digest: str) -> None:
+        doc = {"generated_at": datetime.now().isoformat(timespec="seconds"), "content_hash": digest}
+        doc.update(changes)
+        data = json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._write_atomic(self.changes_path, data)
+        self.metrics.add("changes", bytes_written=len(data))
+
+    def _append_journal(self, entries: List[Dict]) -> None:
+        if not entries:
+            return
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.metrics.phase("journal") as phase, self.journal_path.open("a", encoding="utf-8") as f:
+            lines = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+            f.write(lines)
+            phase.update(rows=len(entries), bytes_written=len(lines.encode("utf-8")))
+
+    def _replay_journal(self, table: StockTable) -> StockTable:
+        """
+        Apply journal entries (in order) over the table loaded from the JSON. Replayed tickers are
+        marked dirty, so the next JSON write (e.g. `compact()` in a fresh process) refreshes
+        their sectors too.
+        """
+        if not self.journal_path.exists():
+            return table
+        with self.journal_path.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                ticker, field, value = entry["ticker"], entry["field"], entry["value"]
+                if field == "industry":
+                    industry = value or ""
+                else:
+                    industry = table.get_field(ticker, "industry") if ticker in table else ""
+                self._mark_dirty(table, ticker, industry)
+                table.set_field(ticker, field, value)
+        return table
+
+    @staticmethod
+    def _journal_user() -> str:
+        try:
+            return getpass.getuser()
+        except Exception:
+            return ""
+
     def _load_existing(self) -> List[Dict]:
+        """Current records as dicts, sorted by ticker."""
+        return self._read_table().to_records()
+
+    def _read_table(self) -> StockTable:
+        with self.metrics.phase("load") as phase:
+            table = self._read_table_from_disk()
+            phase["rows"] = len(table)
+        return table
+
+    def _read_table_from_disk(self) -> StockTable:
         if not self.json_path.exists():
             self.logger.info("No existing file at %s (will create a new one).", self.json_path)
-            return []
+            return self._replay_journal(StockTable())
+        cached = self._read_load_cache()
+        if cached is not None:
+            self.metrics.count("load_cache_hit")
+            return self._replay_journal(cached)
+        self.metrics.count("load_cache_miss")
         with self.json_path.open("r", encoding="utf-8") as f:
             data = json.load(f)
             if isinstance(data, list):
-                return data
+                table = StockTable.from_records(data)
+                self._write_load_cache(table)
+                return self._replay_journal(table)
             raise ValueError(f"{self.json_path} must contain a JSON array.")
 
-    def _write_json(self, records: List[Dict]) -> None:
-        self.json_path.parent.mkdir(parents=True, exist_ok=True)
-        with self.json_path.open("w", encoding="utf-8") as f:
-            json.dump(records, f, indent=2, ensure_ascii=False)
+    def _load_cache_key(self) -> Tuple[int, int]:
+        st = self.json_path.stat()
+        return st.st_size, st.st_mtime_ns
+
+    def _read_load_cache(self) -> Optional[StockTable]:
+        """Table from the pickle snapshot, or None if disabled, missing or stale (keyed by the JSON's size and mtime)."""
+        if not self.load_cache:
+            return None
+        try:
+            with self.load_cache_path.open("rb") as f:
+                key, state = pickle.load(f)
+        except Exception:
+            return None
+        if tuple(key) != self._load_cache_key() or not isinstance(state, dict):
+            return None
+        table = StockTable.__new__(StockTable)
+        table.__dict__.update(state)
+        return table
+
+    def _write_load_cache(self, table: StockTable) -> None:
+        if not self.load_cache:
+            return
+        try:
+            # plain state dict, so the snapshot loads whether this file runs as a script or a module
+            data = pickle.dumps((self._load_cache_key(), vars(table)), protocol=pickle.HIGHEST_PROTOCOL)
+            self._write_atomic(self.load_cache_path, data)
+            self.metrics.add("load_cache", bytes_written=len(data))
+        except OSError as e:
+            self.logger.warning("Could not write load cache %s: %s", self.load_cache_path, e)
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+
+    def _write_json(self, table: StockTable, fast_publish: bool = False) -> str:
+        """
+        Atomically rewrite the JSON and return its sha256. The write is skipped when the file
+        already has exactly this content. The journal is folded in, so its entries are archived afterwards.
+        `fast_publish` is passed to `publish()` as `fast`.
+        """
+        with self.metrics.phase("serialize") as phase:
+            data = json.dumps(table.to_records(), indent=2, ensure_ascii=False).encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()
+            phase["rows"] = len(table)
+        if self._file_digest(self.json_path) == digest:
+            self.metrics.count("json_unchanged")
+            self.logger.info("%s unchanged; skipped write.", self.json_path)
+        else:
+            with self.metrics.phase("write_json") as phase:
+                self._write_atomic(self.json_path, data)
+                phase["bytes_written"] = len(data)
+            self._write_load_cache(table)
+        if self.publish_enabled:
+            self.publish(table, fast=fast_publish)
+        if self.shards_enabled:
+            self.write_shards(table, tickers=self._dirty_tickers, industries=self._dirty_industries)
+        if self.sectors_enabled:
+            self.write_sectors(table, only=self._dirty_industries)
+        if self.search_index_enabled:
+            self.write_search_index(table)
+        self._dirty_industries = set()
+        self._dirty_tickers = set()
+        self._archive_journal()
+        return digest
+
+    def _archive_journal(self) -> None:
+        """Append the folded journal to the archive, then remove it."""
+        try:
+            data = self.journal_path.read_bytes()
+        except FileNotFoundError:
+            return
+        if data:
+            with self.metrics.phase("journal_archive") as phase, self.journal_archive_path.open("ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                phase["bytes_written"] = len(data)
+        self.journal_path.unlink()
+
+    @staticmethod
+    def _file_digest(path: Path) -> Optional[str]:
+        try:
+            return hashlib.sha256(path.read_bytes()).hexdigest()
+        except OSError:
+            return None
 
     # ---------------- Utils ----------------
 
@@ -427,13 +1784,25 @@ class StockDatasetUpdater:
         except ValueError:
             return None
 
-    @staticmethod
-    def _parse_price(s: str) -> str:
+    _PRICE_RE = re.compile(r"(\d+(?:\.\d+)?)")
+
+    @classmethod
+    def _parse_price(cls, s: str) -> str:
         if not s:
             return ""
-        m = re.search(r"(\d+(?:\.\d+)?)", str(s))
+        m = cls._PRICE_RE.search(str(s))
         return m.group(1) if m else ""
 
+    @classmethod
+    def _parse_prices(cls, values: List[str]) -> List[str]:
+        """`_parse_price` over a column."""
+        search = cls._PRICE_RE.search
+        out = []
+        for s in values:
+            m = search(str(s)) if s else None
+            out.append(m.group(1) if m else "")
+        return out
+
     @staticmethod
     def _fmt_market_cap(v: Optional[float]) -> str:
         if v is None:
@@ -444,8 +1813,134 @@ class StockDatasetUpdater:
                 return f"{v / div:.2f}".rstrip("0").rstrip(".") + unit
         return f"{int(v)}"
 
+    @classmethod
+    def _fmt_market_caps(cls, raws: List[str]) -> List[str]:
+        """
+        `_fmt_market_cap(_safe_float(s))` over a column of comma-stripped strings,
+        bucketing units by direct comparison; NaN/inf fall back to the scalar path.
+        """
+        out = []
+        for s in raws:
+            if not s:
+                out.append("")
+                continue
+            try:
+                v = float(s)
+            except ValueError:
+                out.append("")
+                continue
+            a = v if v >= 0 else -v
+            if a >= 1e12:
+                out.append(f"{v / 1e12:.2f}".rstrip("0").rstrip(".") + "T")
+            elif a >= 1e9:
+                out.append(f"{v / 1e9:.2f}".rstrip("0").rstrip(".") + "B")
+            elif a >= 1e6:
+                out.append(f"{v / 1e6:.2f}".rstrip("0").rstrip(".") + "M")
+            elif a >= 1e3:
+                out.append(f"{v / 1e3:.2f}".rstrip("0").rstrip(".") + "K")
+            else:
+                out.append(cls._fmt_market_cap(v))
+        return out
+
 
 # ---------------- CLI menu ----------------
+_TRUE = ("1", "true", "yes", "y")
+DEFAULT_JSON = str(Path(__file__).resolve().parent / "stocks.json")  # next to this file, whatever the cwd
+
+
+def iter_edits(path: str, fmt: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Stream {"ticker", "field", "value"} edits from a CSV or JSONL file (format from the extension
+    unless `fmt` is given). A row is either long (ticker, field, value) or wide: a ticker plus any
+    of EDIT_FIELDS as columns/keys, where empty cells are skipped, and an optional truthy "upsert"
+    column that refreshes the ticker from the screener before its edits.
+    """
+    fmt = (fmt or Path(path).suffix.lstrip(".")).lower()
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"Cannot tell the format of {path}; use a .csv/.jsonl file or pass the format")
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:  # Excel CSVs start with a BOM
+        if fmt == "csv":
+            rows = ((n + 2, row) for n, row in enumerate(csv.DictReader(f)))
+        else:
+            rows = ((n + 1, json.loads(line)) for n, line in enumerate(f) if line.strip())
+        for lineno, row in rows:
+            ticker = str(row.get("ticker") or "").strip().upper()
+            if not ticker:
+                raise ValueError(f"{path}:{lineno}: missing ticker")
+            if row.get("field") is not None:
+                yield {"ticker": ticker, "field": str(row["field"]).strip(), "value": str(row.get("value") or "")}
+                continue
+            if str(row.get(StockDatasetUpdater.UPSERT) or "").strip().lower() in _TRUE:
+                yield {"ticker": ticker, "field": StockDatasetUpdater.UPSERT, "value": ""}
+            for field in StockDatasetUpdater.EDIT_FIELDS:
+                value = row.get(field)
+                if value is not None and str(value).strip() != "":
+                    yield {"ticker": ticker, "field": field, "value": str(value).strip()}
+
+
+def run_cli(argv: List[str]) -> int:
+    """
+    Non-interactive commands (prints a summary, returns the exit code):
+      apply FILE [--format csv|jsonl]   stream edits (see iter_edits) into one batch and one write
+      refresh [--exchanges nyse,nasdaq] update_json() over the chosen exchanges
+    `--json` defaults to DEFAULT_JSON, so the commands work from any directory. `apply` refuses
+    to run without an existing dataset; `refresh` creates one.
+    """
+    parser = argparse.ArgumentParser(prog="update_stocks", description="Update the stocks dataset.")
+    parser.add_argument("--json", default=DEFAULT_JSON, help="dataset path (default: stocks.json next to this script)")
+    parser.add_argument("--api-url", default=None, help="screener endpoint (default: Nasdaq)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    apply_p = sub.add_parser("apply", help="apply target/rating/strategy/industry/last_updated edits and upserts")
+    apply_p.add_argument("file", help="CSV or JSONL edit file")
+    apply_p.add_argument("--format", choices=("csv", "jsonl"), default=None, help="default: from the extension")
+    refresh_p = sub.add_parser("refresh", help="refresh prices and market caps from the screener")
+    refresh_p.add_argument("--exchanges", default="nyse,nasdaq,amex", help="comma-separated subset of nyse,nasdaq,amex")
+    args = parser.parse_args(argv)
+
+    if args.command == "refresh":
+        chosen = {e.strip().lower() for e in args.exchanges.split(",") if e.strip()}
+        unknown = chosen - {"nyse", "nasdaq", "amex"}
+        if unknown or not chosen:
+            parser.error(f"--exchanges must name some of nyse,nasdaq,amex (got {args.exchanges!r})")
+        updater = StockDatasetUpdater(json_path=args.json, include_nyse="nyse" in chosen,
+                                      include_nasdaq="nasdaq" in chosen, include_amex="amex" in chosen,
+                                      api_url=args.api_url)
+        try:
+            changes = updater.update_json()
+        except Exception as e:
+            print(f"refresh failed: {e}", file=sys.stderr)
+            return 1
+        op = updater.metrics.last or {}
+        print(f"Refreshed {', '.join(sorted(chosen))}: {len(changes['added'])} added, "
+              f"{len(changes['removed'])} removed, {len(changes['changed'])} changed "
+              f"in {op.get('duration_s', 0):.2f}s -> {args.json}")
+        return 0
+
+    if not Path(args.json).is_file():
+        print(f"apply failed: no dataset at {args.json} (pass --json)", file=sys.stderr)
+        return 1
+    updater = StockDatasetUpdater(json_path=args.json, api_url=args.api_url)
+    counts: Dict[str, int] = {}
+    tickers = set()
+
+    def counted(edits: Iterator[Dict]) -> Iterator[Dict]:
+        for edit in edits:
+            counts[edit["field"]] = counts.get(edit["field"], 0) + 1
+            tickers.add(edit["ticker"])
+            yield edit
+
+    try:
+        total = updater.apply_edits(counted(iter_edits(args.file, args.format)))
+    except (OSError, ValueError) as e:
+        print(f"apply failed, nothing written: {e}", file=sys.stderr)
+        return 1
+    op = updater.metrics.last or {}
+    detail = ", ".join(f"{field}: {n}" for field, n in sorted(counts.items()))
+    print(f"Applied {total} edits ({detail or 'none'}) to {len(tickers)} tickers "
+          f"in {op.get('duration_s', 0):.2f}s, {op.get('bytes_written', 0)} bytes written -> {args.json}")
+    return 0
+
+
 def main():
     """
     Menu:
@@ -455,8 +1950,10 @@ def main():
       [4] Set/Update last_updated manually
       [5] Set/Update industry manually (does NOT change last_updated)
       [6] Exit
+    With arguments (`python update_stocks.py apply edits.csv`, `... refresh --exchanges nyse`)
+    the non-interactive commands in `run_cli` run instead.
     """
-    json_path = "data/stocks.json"
+    json_path = DEFAULT_JSON
     updater = StockDatasetUpdater(json_path=json_path, include_nyse=True, include_nasdaq=True, include_amex=True)
 
     while True:
@@ -521,4 +2018,6 @@ def main():
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
     main()
@@ -0,0 +1,169 @@
+"""
+Per-operation timings, counters and optional profiles for StockDatasetUpdater (`updater.metrics`).
+"""
+import cProfile
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class UpdaterMetrics:
+    """
+    Instrumentation for StockDatasetUpdater. Every public method call is one operation:
+      {"op", "started_at", "duration_s", "ok", "error", "bytes_read", "bytes_written",
+       "phases": {name: {"calls", "duration_s", "rows"?, "bytes_read"?, "bytes_written"?}},
+       "counters": {name: n}}
+    Public methods called from inside another (publish() during a write, set_* inside
+    apply_edits) are recorded as phases of the outer operation, so phase times are inclusive and
+    may nest. Phases on worker threads (per-exchange downloads) add up across threads.
+
+    Finished operations are kept in `last` / `history` and passed to every hook. With
+    `log_json=True` each is also logged as one JSON line. `profile` takes "cprofile" (stats of
+    the calling thread dumped to `profile_dir/<op>-<timestamp>.prof`, path under "profile")
+    and/or "tracemalloc" (peak bytes and top allocation sites under "tracemalloc").
+    """
+
+    HISTORY = 100
+    PROFILE_MODES = ("cprofile", "tracemalloc")
+    TOP_ALLOCATIONS = 10
+
+    def __init__(self, hooks: Optional[Iterable[Callable[[Dict], None]]] = None, log_json: bool = False,
+                 profile=None, profile_dir: Optional[str] = None, logger: Optional[logging.Logger] = None):
+        self.hooks: List[Callable[[Dict], None]] = list(hooks or [])
+        self.log_json = log_json
+        self.profile = self._parse_modes(profile)
+        self.profile_dir = Path(profile_dir) if profile_dir else Path(".")
+        self.logger = logger or logging.getLogger("StockDatasetUpdater")
+        self.last: Optional[Dict] = None
+        self.history: deque = deque(maxlen=self.HISTORY)
+        self._current: Optional[Dict] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def operation(self, name: str) -> Iterator[Dict]:
+        """Record one operation; inside another operation this is just a phase of it."""
+        if self._current is not None:
+            with self.phase(name):
+                yield self._current
+            return
+        op = {"op": name, "started_at": datetime.now().isoformat(timespec="seconds"), "duration_s": 0.0,
+              "ok": True, "error": None, "phases": {}, "counters": {}}
+        profiler = cProfile.Profile() if "cprofile" in self.profile else None
+        own_tracing = False
+        if "tracemalloc" in self.profile:
+            own_tracing = not tracemalloc.is_tracing()
+            if own_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        self._current = op
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield op
+        except BaseException as e:
+            op["ok"] = False
+            op["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+            op["duration_s"] = round(time.perf_counter() - start, 6)
+            self._current = None
+            if profiler:
+                op["profile"] = self._dump_profile(profiler, name)
+            if "tracemalloc" in self.profile:
+                op["tracemalloc"] = self._tracemalloc_summary(own_tracing)
+            self._finish(op)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Dict]:
+        """
+        Time a phase of the current operation. Set "rows", "bytes_read" or "bytes_written" on the
+        yielded dict to record them. Outside an operation nothing is recorded.
+        """
+        info: Dict = {}
+        op = self._current
+        if op is None:
+            yield info
+            return
+        start = time.perf_counter()
+        try:
+            yield info
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                entry = op["phases"].setdefault(name, {"calls": 0, "duration_s": 0.0})
+                entry["calls"] += 1
+                entry["duration_s"] = round(entry["duration_s"] + elapsed, 6)
+            self.add(name, **info)
+
+    def add(self, phase: str, **values: int) -> None:
+        """Add rows/bytes to a phase of the current operation without timing anything."""
+        op = self._current
+        if op is None:
+            return
+        with self._lock:
+            entry = op["phases"].setdefault(phase, {"calls": 0, "duration_s": 0.0})
+            for key, value in values.items():
+                entry[key] = entry.get(key, 0) + value
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Add to a counter of the current operation (cache hits, retries, ...)."""
+        op = self._current
+        if op is None:
+            return
+        with self._lock:
+            op["counters"][name] = op["counters"].get(name, 0) + n
+
+    def _finish(self, op: Dict) -> None:
+        for key in ("bytes_read", "bytes_written"):
+            op[key] = sum(p.get(key, 0) for p in op["phases"].values())
+        self.last = op
+        self.history.append(op)
+        if self.log_json:
+            self.logger.info("%s", json.dumps(op, ensure_ascii=False, default=str))
+        for hook in self.hooks:
+            try:
+                hook(op)
+            except Exception:
+                self.logger.exception("Metrics hook %r failed", hook)
+
+    def _dump_profile(self, profiler: cProfile.Profile, name: str) -> Optional[str]:
+        path = self.profile_dir / f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.prof"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(path))
+        except OSError as e:
+            self.logger.warning("Could not write profile %s: %s", path, e)
+            return None
+        return str(path)
+
+    def _tracemalloc_summary(self, stop: bool) -> Dict:
+        _, peak = tracemalloc.get_traced_memory()
+        stats = tracemalloc.take_snapshot().statistics("lineno")[:self.TOP_ALLOCATIONS]
+        if stop:
+            tracemalloc.stop()
+        return {
+            "peak_bytes": peak,
+            "top": [{"where": f"{s.traceback[0].filename}:{s.traceback[0].lineno}", "bytes": s.size,
+                     "count": s.count} for s in stats],
+        }
+
+    @classmethod
+    def _parse_modes(cls, profile) -> Tuple[str, ...]:
+        if not profile:
+            return ()
+        names = profile.split(",") if isinstance(profile, str) else profile
+        modes = tuple(m.strip().lower() for m in names if m.strip())
+        unknown = set(modes) - set(cls.PROFILE_MODES)
+        if unknown:
+            raise ValueError(f"Unknown profile mode(s) {sorted(unknown)}; expected {cls.PROFILE_MODES}")
+        return modes
@@ -1,5 +1,6 @@
 /* ====================== Config ====================== */
 const DATA_URL = document.body.dataset.src || "data/stocks.json";
+const SECTORS_URL = document.body.dataset.sectors || "data/sectors.json";
 
 /* ====================== Lenient JSON (.jsqon only) ====================== */
 // Keep this only for .jsqon files (comments, trailing commas, etc.)
@@ -316,15 +317,34 @@ function sortSectorRows(rows){
   });
 }
 
+// Prebuilt sector rows from update_stocks.py (data/sectors.json); null numbers become NaN.
+async function loadSectorRows(){
+  try{
+    const res = await fetch(SECTORS_URL, {cache:"no-cache"});
+    if (res.ok){
+      const raw = await res.json();
+      if (Array.isArray(raw)){
+        const num = v => (v == null ? NaN : v);
+        return raw.map(r => ({...r,
+          mktcap_total: num(r.mktcap_total), cur_median: num(r.cur_median),
+          tgt_median: num(r.tgt_median), upside_pct: num(r.upside_pct)}));
+      }
+    }
+  } catch (err){
+    console.warn("Sector aggregates unavailable; computing from", DATA_URL, err);
+  }
+  return buildSectorRows(await loadStocksData());
+}
+
 // Render sector table
-function renderSectors(allRows){
+function renderSectors(sectorRows){
   if (!sTbody) return; // safe-guard if page not present
   // read filters
   const qName = (document.querySelector("#sector-search")?.value || "").trim().toLowerCase();
   const qMinCov = parseFloat((document.querySelector("#sector-min-coverage")?.value || "").trim());
   const qMinCnt = parseInt((document.querySelector("#sector-min-count")?.value || "").trim(), 10);
 
-  let rows = buildSectorRows(allRows);
+  let rows = sectorRows;
 
   // apply filters
   if (qName) rows = rows.filter(r => r.industry.toLowerCase().includes(qName));
@@ -364,19 +384,19 @@ function renderSectors(allRows){
 }
 
 // Wire sector events
-function wireSectorUI(allRows){
+function wireSectorUI(sectorRows){
   // header sorting
   sThead?.querySelectorAll("th[data-sortable='true']").forEach(th=>{
     th.addEventListener("click", ()=>{
       const key = th.dataset.col;
       if (sectorSort.key === key) sectorSort.dir = sectorSort.dir === "asc" ? "desc" : "asc";
       else { sectorSort.key = key; sectorSort.dir = key === "industry" ? "asc" : "desc"; }
-      renderSectors(allRows);
+      renderSectors(sectorRows);
     });
   });
   // filters
   ["#sector-search","#sector-min-coverage","#sector-min-count"].forEach(sel=>{
-    document.querySelector(sel)?.addEventListener("input", debounce(()=>renderSectors(allRows), 150));
+    document.querySelector(sel)?.addEventListener("input", debounce(()=>renderSectors(sectorRows), 150));
   });
 }
 
@@ -452,6 +472,29 @@ function wireFilters(){
 (function wireBackButtons(){ $$("[data-back]").forEach(btn=>{ btn.addEventListener("click", ()=>{ if (history.length > 1) history.back(); else window.location.href = "index.html"; }); }); })();
 
 /* ====================== Boot (strict JSON for .json) ====================== */
+// Published datasets: data/stocks.manifest.json names a content-hashed, minified copy
+// (written by update_stocks.py). The manifest is tiny and revalidated; the hashed file
+// never changes, so the browser cache can keep it. Falls back to DATA_URL itself.
+async function fetchDatasetText(url){
+  if (/\.json$/i.test(url)){
+    try{
+      const mres = await fetch(url.replace(/\.json$/i, ".manifest.json"), {cache:"no-cache"});
+      if (mres.ok){
+        const manifest = await mres.json();
+        if (manifest && manifest.file){
+          const res = await fetch(url.slice(0, url.lastIndexOf("/") + 1) + manifest.file);
+          if (res.ok) return res.text();
+        }
+      }
+    } catch (err){
+      console.warn("Dataset manifest unavailable; loading", url, err);
+    }
+  }
+  const res = await fetch(url, {cache:"no-store"});
+  if (!res.ok) throw new Error(`Failed to load ${url} (${res.status})`);
+  return res.text();
+}
+
 // Load data only (no rendering). Reuses your DATA_URL + fallbacks.
 async function loadStocksData(){
   // window.STOCKS_DATA
@@ -466,9 +509,7 @@ async function loadStocksData(){
   }
 
   // fetch
-  const res = await fetch(DATA_URL, {cache:"no-store"});
-  if (!res.ok) throw new Error(`Failed to load ${DATA_URL} (${res.status})`);
-  const text = await res.text();
+  const text = await fetchDatasetText(DATA_URL);
   const isJsqon = /\.jsqon$/i.test(DATA_URL);
   const raw = isJsqon ? parseLenientJSON(text) : JSON.parse(text);
   if (!Array.isArray(raw)) throw new Error(`${DATA_URL} must contain a top-level array.`);
@@ -497,10 +538,7 @@ async function loadStocks(){
     }
 
     console.info("Fetching:", DATA_URL);
-    const res = await fetch(DATA_URL, {cache:"no-store"});
-    console.log("Fetch status:", res.status, res.statusText);
-    if (!res.ok) throw new Error(`Failed to load ${DATA_URL} (${res.status})`);
-    const text = await res.text();
+    const text = await fetchDatasetText(DATA_URL);
     console.log("Fetched text length:", text.length);
 
     const isJsqon = /\.jsqon$/i.test(DATA_URL);
@@ -535,8 +573,7 @@ function init(){
 
   // sectors page (load once, then render & wire)
   if (page === "sectors") {
-    loadStocksData().then(rows=>{
-      state.stocks = rows;          // keep in state if you want
+    loadSectorRows().then(rows=>{
       wireSectorUI(rows);
       renderSectors(rows);
     }).catch(err=>{